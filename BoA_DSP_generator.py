@@ -4,17 +4,30 @@
 # License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
 
 import datetime as dt
+import numpy as np
 import pandas as pd
 import re
+import os
+import json
+import csv
+import sys
+import hashlib
+import inspect
 import argparse
+import filecmp
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from operator import attrgetter
 
 from html2latex import html2latex
+from schedule import build_conference
+from profiling import Measured, profiler
 
 ################################################################################
 # cleaner routine that handles all characters giving plain pdflatex trouble    #
 ################################################################################
-def utf8_clean(instr):
-    utf8_to_latex = {
+utf8_to_latex = {
     " &": " \&",
     "#": "\\#",
     "Γ": "\\ensuremath\\Gamma ",
@@ -52,20 +65,36 @@ def utf8_clean(instr):
     "^m": "\\textsuperscript{m}",
     "\percent": "\%", # we replaced % by \percent in html2latex
     "\&=": "&=" 
-    }
+}
 
+# The replacements above used to be applied one after another, each one
+# walking and copying the whole string. Instead, a single regular expression
+# matches all keys (longest first) and substitutes them in one pass. The only
+# interaction between the sequential replacements that does not come from
+# the input itself is " &=", which the first rule escapes and the last one
+# un-escapes again. Characters mapped to "" may join their neighbours into new
+# keys, so input containing them takes the ordered path.
+utf8_single_pass = {**utf8_to_latex, " &=": " &="}
+utf8_pattern = re.compile('|'.join(re.escape(key) for key in
+                                   sorted(utf8_single_pass, key=len, reverse=True)))
+utf8_deleted = [key for key, value in utf8_to_latex.items() if value == '']
+
+def utf8_clean_ordered(instr):
     for key, value in utf8_to_latex.items():
         instr = instr.replace(key, value)
     return instr
 
+def utf8_clean(instr):
+    if any(key in instr for key in utf8_deleted):
+        return utf8_clean_ordered(instr)
+    return utf8_pattern.sub(lambda match: utf8_single_pass[match.group(0)], instr)
+
 ################################################################################
 # for the daily schedule we need to know how long a contribution is,           #
 # and advance time by 20 minutes                                               #
 ################################################################################
 def get_duration(start, end):
-    dt1 = dt.datetime.fromisoformat(start)
-    dt2 = dt.datetime.fromisoformat(end)
-    return (dt2-dt1).total_seconds() / 60
+    return (end-start).total_seconds() / 60
 
 def advance_slot(start, times, slot=20):
     match slot:
@@ -76,456 +105,586 @@ def advance_slot(start, times, slot=20):
     return start + delta
 
 ################################################################################
-# helper routines fetching row entries from the CSV dataframe into easier to   #
-# handle dictioniaries                                                         #
+# Prefix index over a list sorted by one of its attributes. All items whose    #
+# value starts with a given prefix form a contiguous block of the sorted list, #
+# so looking up a session family (PL, PML, RvML, MS, YRM, DFG, S, Poster) or a #
+# section is a binary search instead of a string scan over the whole list.     #
+# Results are kept, as every section is asked for more than once.              #
+################################################################################
+session_families = ['PL', 'PML', 'RvML', 'MS', 'YRM', 'DFG', 'S', 'Poster']
+
+class PrefixIndex:
+    def __init__(self, items, attribute):
+        self.items = sorted(items, key=attrgetter(attribute))
+        self.keys = [getattr(item, attribute) for item in self.items]
+        self.blocks = {}
+
+    def startswith(self, prefix):
+        if prefix not in self.blocks:
+            first = bisect_left(self.keys, prefix)
+            last = first
+            while last < len(self.keys) and self.keys[last].startswith(prefix):
+                last += 1
+            self.blocks[prefix] = self.items[first:last]
+        return self.blocks[prefix]
+
+def index_sessions(conference):
+    sessions = PrefixIndex(conference.sessions, 'number')
+    for family in session_families:
+        sessions.startswith(family)
+    return sessions
+
+################################################################################
+# helper routines collecting the organizers of a section                       #
 ################################################################################
-def get_section_info(df, section):
+def section_organizers(org, section):
     if section.startswith('DFG-PP'):
         section = section.replace('DFG-PP', 'SPP')
     if section.startswith('DFG-GRK'):
         section = section.replace('DFG-GRK', 'GRK')
-    sect_organ = df[df['track_type'].str.startswith(section)]
+    return org.startswith(section)
+
+def get_section_info(sect_organ):
     organizers = ''
     title = '\\color{red}{NOT AVAILABLE}'
     first = True
-    for _, row in sect_organ.iterrows():
+    for organizer in sect_organ:
         if not first:
             organizers += '\\newline '
-        organizers += f'{row["name"]}, {row["firstname"]} {{\\em ({row["organisation"]})}}'
-        title = row["track_type"]
+        organizers += f'{organizer.name}, {organizer.firstname} {{\\em ({organizer.organisation})}}'
+        title = organizer.track_type
         first = False
     return title, organizers
 
-def get_session_info(row):
-    start = dt.datetime.fromisoformat(row['session_start'])
-    end   = dt.datetime.fromisoformat(row['session_end'])
-    c1 = row['chair1']
-    c2 = row['chair2']
-    c3 = row['chair3']
-
-    if pd.isna(c3):
-        if pd.isna(c2):
-            if pd.isna(c1):
-                chairs = ''
-            else:
-                chairs = c1
+################################################################################
+# Abstracts are converted to LaTeX and cleaned exactly once. Results are kept  #
+# under the SHA-256 of the raw HTML with least recently used eviction, and the #
+# cache can be stored next to the schedule cache to carry over to later runs.  #
+# Writers insert the converted abstracts as they are, without cleaning again.  #
+################################################################################
+def convert_abstract(html):
+    return utf8_clean(html2latex(html))
+
+# hash of the code and tables the converted abstracts depend on
+def abstract_version():
+    sources = [inspect.getsource(sys.modules[html2latex.__module__]),
+               inspect.getsource(convert_abstract), inspect.getsource(utf8_clean),
+               inspect.getsource(utf8_clean_ordered), repr(utf8_to_latex)]
+    return hashlib.sha256('\n'.join(sources).encode()).hexdigest()
+
+class ConversionCache:
+    def __init__(self, convert, maxsize=8192):
+        self.convert = convert
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, html):
+        key = hashlib.sha256(html.encode()).hexdigest()
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        value = self.convert(html)
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return value
+
+    def load(self, fname, version):
+        try:
+            with open(fname, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if stored.get('version') == version:
+            self.entries.update(stored['entries'][-self.maxsize:])
+
+    def save(self, fname, version):
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        with open(fname + '.part', 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'entries': list(self.entries.items())}, f)
+        os.replace(fname + '.part', fname)
+
+    def report(self):
+        return f'{self.hits} hits, {self.misses} misses, {len(self.entries)} entries'
+
+abstracts = ConversionCache(convert_abstract)
+
+################################################################################
+# All contributions are normalized once per run into a long table with one     #
+# row per talk instead of reading the wide p1_* ... pN_* columns cell by cell  #
+# in every generator.                                                          #
+################################################################################
+contribution_fields = {
+    'title':             'title',
+    'authors':           'authors',
+    'organisations':     'organizations',
+    'presenting_author': 'presenter',
+    'abstract':          'abstract',
+    'start':             'start',
+    'end':               'end',
+}
+
+def get_contributions(df):
+    nmax = max(int(match.group(1)) for match in
+               (re.fullmatch(r'p(\d+)_presenting_author', col) for col in df.columns)
+               if match is not None)
+    frames = []
+    for idx in range(1, nmax+1):
+        columns = {f'p{idx}_{field}': name for field, name in contribution_fields.items()}
+        frame = df[list(columns)].rename(columns=columns)
+        frame.insert(0, 'idx', idx)
+        frame.insert(0, 'session_short', df['session_short'])
+        frame.insert(0, 'session', df.index)
+        frames.append(frame)
+    contributions = pd.concat(frames, ignore_index=True)
+    contributions = contributions[contributions['presenter'].notna()].copy()
+
+    contributions['authors'] = [authors.replace(presenter, f'\\presenter{{{presenter}}}')
+                                for authors, presenter in zip(contributions['authors'],
+                                                              contributions['presenter'])]
+    contributions['abstract'] = contributions['abstract'].map(abstracts, na_action='ignore').fillna('')
+    contributions['start_time'] = contributions['start'].dt.strftime('%H:%M')
+    duration = (contributions['end'] - contributions['start']).dt.total_seconds() / 60
+    contributions['duration'] = duration.where(~contributions['session_short'].str.startswith('Poster'), 0)
+    # first 20 minute column of the daily program a talk may occupy, counted
+    # from the start of its session (and thus of its block of parallel sessions)
+    session_start = df['session_start'].reindex(contributions['session']).to_numpy()
+    offset = (contributions['start'] - session_start) / pd.Timedelta(minutes=20)
+    contributions['slot'] = np.ceil(offset).fillna(0).astype(int)
+    return contributions.sort_values(by=['session', 'idx'], kind='stable')
+
+################################################################################
+# Output layer: files are only rewritten when their content changes, so the    #
+# modification times (and latexmk) only see real changes. A new version is     #
+# written to <file>.part and renamed over the old one, so an interrupted run   #
+# never leaves a truncated file behind. The dependency graph records which     #
+# generated and static files feed which PDF, for RunMe.py to recompile only    #
+# the documents whose inputs changed.                                          #
+################################################################################
+def write_tex(fname, contents):
+    try:
+        with open(fname, 'r', encoding='utf-8') as f:
+            if f.read() == contents:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(fname + '.part', 'w', encoding='utf-8') as f:
+        f.write(contents)
+    os.replace(fname + '.part', fname)
+    return True
+
+# Streaming counterpart of write_tex for the large generated files. Fragments
+# go through a buffered handle into <fname>.part as they are produced, write()
+# cleans each fragment with utf8_clean, write_raw() takes text that is clean
+# already or must not be cleaned. On close the file replaces <fname> only if
+# the content differs, otherwise the old file and its timestamp are kept.
+class TexFile:
+    def __init__(self, fname):
+        self.fname = fname
+        self.tmp = fname + '.part'
+        self.changed = False
+
+    def __enter__(self):
+        self.f = open(self.tmp, 'w', encoding='utf-8')
+        return self
+
+    def write(self, fragment):
+        self.f.write(utf8_clean(fragment))
+
+    def write_raw(self, text):
+        self.f.write(text)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.f.close()
+        if exc_type is not None:
+            os.remove(self.tmp)
+            return False
+        if os.path.exists(self.fname) and filecmp.cmp(self.tmp, self.fname, shallow=False):
+            os.remove(self.tmp)
         else:
-            chairs = f'{c1}\\newline {c2}'
-    else:
-        chairs = f'{c1}\\newline {c2}\\newline {c3}'
-
-    session = {
-        "chairs"   : chairs,
-        "number"   : row['session_short'],
-        "name"     : row['session_title'],
-        "room"     : row['session_room'],
-        "start"    : start.strftime("%H:%M"),
-        "end"      : end.strftime("%H:%M"),
-        "date"     : start.strftime("%B %d, %Y")
-    }
-    return session
-
-def get_contribution_info(row, idx, RvML=False):
-    ptitle     = f'p{idx}_title'
-    pauthors   = f'p{idx}_authors'
-    porgas     = f'p{idx}_organisations'
-    ppresenter = f'p{idx}_presenting_author'
-    pabstract  = f'p{idx}_abstract'
-    pstart     = f'p{idx}_start'
-    pend       = f'p{idx}_end'
-
-    presenter = row[ppresenter]
-    if pd.isna(presenter):
-        return None
-    authors = row[pauthors]
-    authors = authors.replace(presenter, f'\\presenter{{{presenter}}}')
-    if row['session_short'].startswith('Poster'):
-        duration = 0
-    else:
-        duration = get_duration(row[pstart], row[pend])
-    if row[pabstract] != row[pabstract]:
-        abstract = ''
-    else:
-        abstract = html2latex(row[pabstract])
-    if RvML:
-        start = dt.datetime.fromisoformat(row[pstart]).strftime('%H:%M')
-        end   = dt.datetime.fromisoformat(row[pend]).strftime('%H:%M')
-    else:
-        start = row[pstart]
-        end   = row[pend]
-    
-    contribution = {
-        "title"         : row[ptitle],
-        "authors"       : authors,
-        "presenter"     : presenter,
-        "start"         : start,
-        "end"           : end,
-        "duration"      : duration,
-        "abstract"      : abstract,
-        "organizations" : row[porgas]
+            os.replace(self.tmp, self.fname)
+            self.changed = True
+        return False
+
+graph_file = './LaTeX/dependencies.json'
+static_inputs = {
+    'boa': ['./LaTeX/Book_of_abstracts/gamm-boa.cls',
+            './LaTeX/this-gamm.sty',
+            './LaTeX/Common/gamm-titlepage.sty'],
+    'dsp': ['./LaTeX/Daily_Scientific_Program/gamm-dsp.cls',
+            './LaTeX/this-gamm.sty',
+            './LaTeX/Common/gamm-titlepage.sty'],
+}
+
+def graph_entry(target, texfile, inputs):
+    return {
+        "target":  target,
+        "workdir": os.path.normpath(os.path.dirname(texfile)),
+        "texfile": os.path.basename(texfile),
+        "inputs":  [os.path.normpath(fname) for fname in [texfile] + inputs],
     }
-    return contribution
 
-def get_plenary_info(row):
-    start = dt.datetime.fromisoformat(row['session_start'])
-    end   = dt.datetime.fromisoformat(row['session_end'])
-    if pd.isna(row['chair1']):
-        chair = '\color{red} NOT AVAILABLE'
-    else:
-        chair = row['chair1']
-    if pd.isna(row['p1_organisations']):
-        speaker = '\presenter{' + row['p1_presenting_author'] + '}'
-    else:
-        speaker = '\presenter{' + row['p1_presenting_author'] + '} {\\em (' + row['p1_organisations'] + ')}'
-    contribution = {
-        "session"  : row['session_short'],
-        "title"    : row['p1_title'],
-        "speaker"  : speaker,
-        "abstract" : html2latex(row['p1_abstract']),
-        "chair"    : chair,
-        "room"     : row['session_room'],
-        "start"    : start.strftime("%H:%M"),
-        "end"      : end.strftime("%H:%M"),
-        "date"     : start.strftime("%B %d, %Y")
+# `boa_parts` are the (part, inputs) of the book of abstracts in the order of
+# the book, with `chapters` they are kept as a list for compiling the book part
+# by part
+def write_dependency_graph(boa_parts, rooms, chapters=False):
+    boa = './LaTeX/Book_of_abstracts/BookOfAbstracts.tex'
+    graph = {
+        'BookOfAbstracts': graph_entry('boa', boa, [fname for _, inputs in boa_parts for fname in inputs]
+                                       + static_inputs['boa']),
+        'Daily_Scientific_Program': graph_entry('dsp', './LaTeX/Daily_Scientific_Program/Daily_Scientific_Program.tex',
+                                                static_inputs['dsp']),
     }
-    return contribution
+    if chapters:
+        graph['BookOfAbstracts']['parts'] = [[part, graph_entry('boa', boa, inputs + static_inputs['boa'])['inputs']]
+                                             for part, inputs in boa_parts]
+    for room, fname in rooms.items():
+        graph[room] = graph_entry('rooms', fname, [])
+    write_tex(graph_file, json.dumps(graph, indent=2, sort_keys=True) + '\n')
+
+# only some room plans were generated, the other entries stay as they are
+def update_dependency_graph(rooms):
+    try:
+        with open(graph_file, 'r', encoding='utf-8') as f:
+            graph = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return
+    for room, fname in rooms.items():
+        graph[room] = graph_entry('rooms', fname, [])
+    write_tex(graph_file, json.dumps(graph, indent=2, sort_keys=True) + '\n')
 
 ################################################################################
 # helpers for writing the actual section files in LaTeX                        #
 ################################################################################
-def write_PML(df, outdir):
-    file = open(outdir+'/PML.tex', 'w', encoding='utf-8')
-    for _, row in df.iterrows():
-        PML = get_plenary_info(row)
-        ostring  = f'\\Prandtl{{{PML["title"]}}}%\n'
-        ostring += f'        {{{PML["session"]}}}%\n'
-        ostring += f'        {{{PML["speaker"]}}}%\n'
-        ostring += f'        {{{PML["date"]}}}%\n'
-        ostring += f'        {{{PML["start"]}}}%\n'
-        ostring += f'        {{{PML["end"]}}}%\n'
-        ostring += f'        {{{PML["room"]}}}%\n'
-        ostring += f'        {{{PML["chair"]}}}%\n'
-        ostring += f'        {{{PML["abstract"]}}}%\n'
-        ostring = utf8_clean(ostring)
-        file.write(ostring)
-        file.close()
+def write_PML(sessions, outdir):
+    with TexFile(outdir+'/PML.tex') as out:
+        for S in sessions:
+            PML = S.contribution(1)
+            out.write(f'\\Prandtl{{{PML.title}}}%\n')
+            out.write(f'        {{{S.number}}}%\n')
+            out.write(f'        {{{PML.speaker}}}%\n')
+            out.write(f'        {{{S.date}}}%\n')
+            out.write(f'        {{{S.start_time}}}%\n')
+            out.write(f'        {{{S.end_time}}}%\n')
+            out.write(f'        {{{S.room}}}%\n')
+            out.write(f'        {{{S.chair}}}%\n')
+            # the abstract is cleaned already
+            out.write_raw(f'        {{{PML.abstract}}}%\n')
     return '\\input{PML.tex}\n'
 
-def write_PL(df, outdir):
+def write_PL(sessions, outdir):
     inputs = ''
-    for _, row in df.iterrows():
-        PL = get_plenary_info(row)
-        fname = f'{PL["session"]}.tex'
-        file = open(outdir+'/'+fname, 'w', encoding='utf-8')
-        ostring  = f'\\Plenary{{{PL["title"]}}}%\n'
-        ostring += f'        {{{PL["session"]}}}%\n'
-        ostring += f'        {{{PL["speaker"]}}}%\n'
-        ostring += f'        {{{PL["date"]}}}%\n'
-        ostring += f'        {{{PL["start"]}}}%\n'
-        ostring += f'        {{{PL["end"]}}}%\n'
-        ostring += f'        {{{PL["room"]}}}%\n'
-        ostring += f'        {{{PL["chair"]}}}\n'
-        ostring += f'        {{{PL["abstract"]}}}%\n'
-        ostring = utf8_clean(ostring)
-        file.write(ostring)
-        file.close()
+    for S in sessions:
+        PL = S.contribution(1)
+        fname = f'{S.number}.tex'
+        with TexFile(outdir+'/'+fname) as out:
+            out.write(f'\\Plenary{{{PL.title}}}%\n')
+            out.write(f'        {{{S.number}}}%\n')
+            out.write(f'        {{{PL.speaker}}}%\n')
+            out.write(f'        {{{S.date}}}%\n')
+            out.write(f'        {{{S.start_time}}}%\n')
+            out.write(f'        {{{S.end_time}}}%\n')
+            out.write(f'        {{{S.room}}}%\n')
+            out.write(f'        {{{S.chair}}}\n')
+            # the abstract is cleaned already
+            out.write_raw(f'        {{{PL.abstract}}}%\n')
         inputs += f'\\input{{{fname}}}\n'
     return inputs
 
-def write_RvML(df, outdir):
-    file = open(outdir+'/RvML.tex', 'w', encoding='utf-8')
-    for _, row in df.iterrows():
-        date = dt.datetime.fromisoformat(row['session_start']).strftime("%B %d, %Y")
-        room = row['session_room']
-        ostring = ''
-        for j in range(1,3):
-            RvML = get_contribution_info(row,j, RvML=True)
-            if not pd.isna(row[f'p{j}_presenting_author']):
-                ostring += f'\\Mises{{{RvML["title"]}}}%\n'
-                ostring +=  '       {Richard von Mises Lecture}%\n'
-                ostring += f'       {{\\presenter{{{RvML["presenter"]}}}~{{\\em({RvML["organizations"]})}}}}%\n'
-                ostring += f'       {{{date}}}%\n'
-                ostring += f'       {{{RvML["start"]}}}%\n'
-                ostring += f'       {{{RvML["end"]}}}%\n'
-                ostring += f'       {{{room}}}{{}}%\n'
-        ostring = utf8_clean(ostring)
-        file.write(ostring)
-        file.close()
+def write_RvML(sessions, outdir):
+    with TexFile(outdir+'/RvML.tex') as out:
+        for S in sessions:
+            for j in range(1,3):
+                RvML = S.contribution(j)
+                if RvML is not None:
+                    out.write(f'\\Mises{{{RvML.title}}}%\n')
+                    out.write( '       {Richard von Mises Lecture}%\n')
+                    out.write(f'       {{\\presenter{{{RvML.presenter}}}~{{\\em({RvML.organizations})}}}}%\n')
+                    out.write(f'       {{{S.date}}}%\n')
+                    out.write(f'       {{{RvML.start.strftime("%H:%M")}}}%\n')
+                    out.write(f'       {{{RvML.end.strftime("%H:%M")}}}%\n')
+                    out.write(f'       {{{S.room}}}{{}}%\n')
     return '\\input{RvML.tex}\n'
 
-def write_section(org, sec, df, outdir, toc_sessions_silent=False):
+# writes one section from its sessions and organizers, runs in the worker
+# processes of write_sections
+def write_section(sec, sessions, organizers, outdir, toc_sessions_silent=False):
     fname = sec.replace(' ', '_')
     fullname = outdir+'/'+fname+'.tex'
-    file = open(fullname, 'w', encoding='utf-8')
-    title, organizers = get_section_info(org, sec)
-    ostring  = f'\\Section{{{title}}}%\n'
-    ostring += f'        {{{organizers}}}\n\n'
-
-    sessions = df[df['session_short'].str.startswith(sec)]
-    for _, row in sessions.iterrows():
-        S = get_session_info(row)
-        if toc_sessions_silent:
-            ostring += '\SSession'
-        else:
-            ostring += '\Session'
-        ostring += f'{{{S["number"]}}}%\n'
-        ostring += f'{{{S["name"]}}}%\n'
-        ostring += f'{{{S["date"]}}}%\n'
-        ostring += f'{{{S["start"]}}}%\n'
-        ostring += f'{{{S["end"]}}}%\n'
-        ostring += f'{{{S["room"]}}}%\n'
-        ostring += f'{{{S["chairs"]}}}%\n'
-        for i in range(1,7):
-            C = get_contribution_info(row, i)
-            if C is None:
-                break
-            organizations = C["organizations"]
-            organizations = organizations.replace('; ','\\newline ')
-            start = re.sub('^.* ','', C["start"])
-            ostring += f'\\Contribution{{{C["title"]}}}%\n'
-            ostring += f'{{{C["authors"]}}}%\n'
-            ostring += f'{{{start}}}%\n'
-            ostring += f'{{{organizations}}}\n'
-            ostring += f'{{{html2latex(C["abstract"])}}}%\n'
-    ostring = utf8_clean(ostring)
-    file.write(ostring)
-    file.close()
+    title, organizers = get_section_info(organizers)
+    with TexFile(fullname) as out:
+        out.write(f'\\Section{{{title}}}%\n')
+        out.write(f'        {{{organizers}}}\n\n')
+
+        for S in sessions:
+            if toc_sessions_silent:
+                out.write('\\SSession')
+            else:
+                out.write('\\Session')
+            out.write(f'{{{S.number}}}%\n')
+            out.write(f'{{{S.name}}}%\n')
+            out.write(f'{{{S.date}}}%\n')
+            out.write(f'{{{S.start_time}}}%\n')
+            out.write(f'{{{S.end_time}}}%\n')
+            out.write(f'{{{S.room}}}%\n')
+            out.write(f'{{{S.chairs}}}%\n')
+            for i in range(1,7):
+                C = S.contribution(i)
+                if C is None:
+                    break
+                organizations = C.organizations.replace('; ','\\newline ')
+                out.write(f'\\Contribution{{{C.title}}}%\n')
+                out.write(f'{{{C.authors}}}%\n')
+                out.write(f'{{{C.start_time}}}%\n')
+                out.write(f'{{{organizations}}}\n')
+                # the abstract is cleaned already
+                out.write_raw(f'{{{C.abstract}}}%\n')
     return fname
 
-def write_sections(organizers, sessions, outdir):
-    inputs = ''
+# The sections of the chapters as (name, silent table of contents entries)
+def minis_sections(sessions):
+    sections  = [(f'MS{i+1}', True) for i in range(len(sessions.startswith('MS')))]
+    sections += [(f'YRM{i+1}', True) for i in range(len(sessions.startswith('YRM')))]
+    return sections
+
+def dfg_sections(sessions):
+    return [(S.number, True) for S in sessions.startswith('DFG')]
+
+def contributed_sections():
+    sections = []
     for i in range(1,27):
         if not i == 6:
-            fname = write_section(organizers, f'S{i:02}', sessions, outdir)
-            inputs += f'\\input{{{fname}}}\n'
+            sections.append((f'S{i:02}', False))
         else:
-            fname1 = write_section(organizers, f'S{i:02}.1', sessions, outdir)
-            fname2 = write_section(organizers, f'S{i:02}.2', sessions, outdir)
-            inputs += f'\\input{{{fname1}}}\n\\input{{{fname2}}}\n'
-    return inputs
+            sections += [(f'S{i:02}.1', False), (f'S{i:02}.2', False)]
+    return sections
 
-def write_minis(organizers, MS, YRM, outdir):
-    inputs = ''
-    for i in range(len(MS)):
-        name = f'MS{i+1}'
-        fname = write_section(organizers, name, MS, outdir,
-                              toc_sessions_silent=True)
-        inputs += f'\\input{{{fname}}}\n'
+def boa_sections(sessions):
+    return minis_sections(sessions) + dfg_sections(sessions) + contributed_sections()
 
-    for i in range(len(YRM)):
-        name = f'YRM{i+1}'
-        fname = write_section(organizers, name, YRM, outdir,
-                              toc_sessions_silent=True)
-        inputs += f'\\input{{{fname}}}\n'
-    return inputs
+# the files in the Sessions folder of the book of abstracts printing the
+# session `number`
+def boa_files(number, sessions):
+    if number.startswith('PML'):
+        return ['PML.tex']
+    if number.startswith('RvML'):
+        return ['RvML.tex']
+    if number.startswith('PL'):
+        return [f'{number}.tex']
+    return [sec.replace(' ', '_') + '.tex' for sec, _ in boa_sections(sessions) if number.startswith(sec)]
 
-def write_dfg(organizers, df, outdir):
-    inputs = ''
-    for _, row in df.iterrows():
-        fname = write_section(organizers, row['session_short'], df, outdir,
-                              toc_sessions_silent=True)
-        inputs += f'\\input{{{fname}}}\n'
-    return inputs
+# calls `function` with the arguments of every task in a pool of `jobs` worker
+# processes (or in this process for a single job), results come back in the
+# order of the tasks. When profiling, every task is recorded as `stage` with
+# its first argument as the item.
+def run_tasks(function, tasks, jobs=1, stage=None):
+    if stage is not None and profiler.enabled:
+        results = run_tasks(Measured(function), tasks, jobs)
+        for task, (_, measurements) in zip(tasks, results):
+            profiler.add(stage, str(task[0]), **measurements)
+        return [result for result, _ in results]
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            chunksize = max(1, len(tasks) // (4 * jobs))
+            return list(pool.map(function, *zip(*tasks), chunksize=chunksize))
+    return [function(*task) for task in tasks]
+
+# Sections are independent, so they are written by a pool of `jobs` worker
+# processes. Every worker gets the sessions and organizers of its section
+# only, the file names come back in the order of `sections`.
+def write_sections(sections, sessions, organizers, outdir, jobs=1):
+    tasks = [(sec, sessions.startswith(sec), section_organizers(organizers, sec), outdir, silent)
+             for sec, silent in sections]
+    return run_tasks(write_section, tasks, jobs, stage='write_section')
 
 ################################################################################
-# routine for writing the tables in the daily session program                 #
+# routine for writing the tables in the daily session program. The timeline   #
+# groups the sessions into blocks of parallel sessions in one pass over the   #
+# sessions sorted by start, and every talk carries its precomputed column in  #
+# the block (its slot), so building a table only looks up cells.              #
 ################################################################################
-def make_session_table(SAT, start, n, withMises=False):
+def timeline(conference):
+    blocks = {}
+    for S in sorted(conference.sessions, key=attrgetter('start')):
+        blocks.setdefault(S.start, []).append(S)
+    return [(start, sorted(sessions, key=attrgetter('number'))) for start, sessions in blocks.items()]
+
+def make_session_table(out, SAT, start, n, withMises=False):
     match n:
         case 1:
-            inputs = '\\begin{longtable}{PA|}\n'
+            out.write('\\begin{longtable}{PA|}\n')
         case 2:
-            inputs = '\\begin{longtable}{PmM|}\n'
+            out.write('\\begin{longtable}{PmM|}\n')
         case 3:
-            inputs = '\\begin{longtable}{Pxyx|}\n'
+            out.write('\\begin{longtable}{Pxyx|}\n')
         case 6:
-            inputs = '\\begin{longtable}{PXYXYXY|}\n'
+            out.write('\\begin{longtable}{PXYXYXY|}\n')
         case 16: #this is the same magic 16 as in make_dsp working for 2024's GAMM
-            inputs = '\\begin{longtable}{PA|}\n'
+            out.write('\\begin{longtable}{PA|}\n')
         case _: # non-standard session length
             raise SystemExit('non-standard session length detected')
 
-    inputs += '    \\rowcolor{primary}'
+    out.write('    \\rowcolor{primary}')
     if n != 16:
         k = n
     else:
         k = 1 # Exception for Poster session
     for i in range(k):
         slot_start = advance_slot(start, i).strftime("%H:%M")
-        inputs += f'&\\white{{{slot_start}}}'
-    inputs += '\\\\\n\endhead\n'
+        out.write(f'&\\white{{{slot_start}}}')
+    out.write('\\\\\n\endhead\n')
     skip = False
-    for _, row in SAT.iterrows():
-        sname = row['session_short']
-        sroom = row['session_room']
-        inputs += f'\\white{{{sname}}}\\newline\\white{{\small ({sroom})}}'
+    for S in SAT:
+        sname = S.number
+        sroom = S.room
+        out.write(f'\\white{{{sname}}}\\newline\\white{{\small ({sroom})}}')
         j = 0 # j counts speakers/contributions in the session CSV
         drop_extra_empty = False
         for i in range(n): # i counts table columns
             if not skip:
                 j += 1
-                contribution = get_contribution_info(row, j)
+                contribution = S.contribution(j)
                 if contribution is None:
                     if sname == 'RvML':
-                        inputs += '\n&\\footnotesize{\\bfseries Price winner(s) and title(s) will be announced in the Opening}'
+                        out.write('\n&\\footnotesize{\\bfseries Price winner(s) and title(s) will be announced in the Opening}')
                     else:
                         if not drop_extra_empty:
-                            inputs += '\n&'
+                            out.write('\n&')
                 else:
-                    match contribution["duration"]:
+                    match contribution.duration:
                         case 60: # PLenary lectures (incl Prandtl)
-                            inputs += f'\n&\\footnotesize{{\\bfseries {contribution["title"]}}}\\newline\presenter{{{contribution["presenter"]}}}'
+                            out.write(f'\n&\\footnotesize{{\\bfseries {contribution.title}}}\\newline\presenter{{{contribution.presenter}}}')
                         case 40: # Topcial Speakers
                             skip = True # found a topical speaker double slot and skip next
                             match n:
                                 case 3:
-                                    inputs += '\n&\multicolumn{2}{t}'
+                                    out.write('\n&\multicolumn{2}{t}')
                                 case 6:
-                                    inputs += '\n&\multicolumn{2}{T}'
-                            inputs += f'{{\\footnotesize{{\\bfseries {contribution["title"]}}}\\newline\presenter{{{contribution["presenter"]}}}}}'
+                                    out.write('\n&\multicolumn{2}{T}')
+                            out.write(f'{{\\footnotesize{{\\bfseries {contribution.title}}}\\newline\presenter{{{contribution.presenter}}}}}')
                         case 30: # either von Mises Lecture session with 2 talks or Minisymposium with 4 talks
                             if sname == 'RvML':
                                 if withMises:
-                                    inputs += f'\n&\\footnotesize{{\\bfseries {contribution["title"]}}}\\newline\presenter{{{contribution["presenter"]}}}'
+                                    out.write(f'\n&\\footnotesize{{\\bfseries {contribution.title}}}\\newline\presenter{{{contribution.presenter}}}')
                                 else:
-                                   inputs += '\n&\\footnotesize{\\bfseries Price winner(s) and title(s) will be announced in the Opening}'
+                                   out.write('\n&\\footnotesize{\\bfseries Price winner(s) and title(s) will be announced in the Opening}')
                             else:
                                 match i:
                                     case 0:
                                         drop_extra_empty = True
-                                        inputs += '\n&\multicolumn{6}{A}{\\noindent\\begin{tabularx}{\linewidth}{@{}BCBC@{}}'
-                                        inputs += f'\\footnotesize{{\\bfseries {contribution["title"]}}}\\newline\presenter{{{contribution["presenter"]}}}'
+                                        out.write('\n&\multicolumn{6}{A}{\\noindent\\begin{tabularx}{\linewidth}{@{}BCBC@{}}')
+                                        out.write(f'\\footnotesize{{\\bfseries {contribution.title}}}\\newline\presenter{{{contribution.presenter}}}')
                                     case 3:
-                                        inputs += f'\n&\\footnotesize{{\\bfseries {contribution["title"]}}}\\newline\presenter{{{contribution["presenter"]}}}'
-                                        inputs += '\end{tabularx}}'
+                                        out.write(f'\n&\\footnotesize{{\\bfseries {contribution.title}}}\\newline\presenter{{{contribution.presenter}}}')
+                                        out.write('\end{tabularx}}')
                                     case _:
-                                        inputs += f'\n&\\footnotesize{{\\bfseries {contribution["title"]}}}\\newline\presenter{{{contribution["presenter"]}}}'
+                                        out.write(f'\n&\\footnotesize{{\\bfseries {contribution.title}}}\\newline\presenter{{{contribution.presenter}}}')
                         case 20: # the default 20 minutes section talks
-                            shift = get_duration(advance_slot(start,i).isoformat(), contribution["start"])
-                            if shift > 0: # there is a gap in the schedule
-                                inputs += '\n&' # add empty cell
+                            if contribution.slot > i: # there is a gap in the schedule
+                                out.write('\n&') # add empty cell
                                 j -= 1 # revisit contribution for next column
                             else:
-                                inputs += f'\n&\\footnotesize{{\\bfseries {contribution["title"]}}}\\newline\presenter{{{contribution["presenter"]}}}'
+                                out.write(f'\n&\\footnotesize{{\\bfseries {contribution.title}}}\\newline\presenter{{{contribution.presenter}}}')
                         case 0: # we explicitly set 0 for posters
-                            inputs += f'\n&\\footnotesize{{\\bfseries {contribution["title"]}}}\\newline\presenter{{{contribution["presenter"]}}}\\\\\\hline'
+                            out.write(f'\n&\\footnotesize{{\\bfseries {contribution.title}}}\\newline\presenter{{{contribution.presenter}}}\\\\\\hline')
             else:
                 skip = False
-        inputs += '\\\\\\hline\n'
-    inputs += '\end{longtable}\n'
-    return utf8_clean(inputs)
-
-def make_room_session_table(row, day, withMises=False):
-    start = dt.datetime.fromisoformat(row['session_start'])
-    end = dt.datetime.fromisoformat(row['session_end'])
-    stime = start.strftime("%H:%M")
-    etime = end.strftime("%H:%M")
-    inputs  = f'\n\\begin{{samepage}}\n\\section*{{{day}\hfill{stime}--{etime}}}\n'
-    session = row['session_short']
-    inputs += f'\n\\begin{{center}}\huge\\bfseries {session}\end{{center}}\n'
-    inputs += '\\begin{tabularx}{\linewidth}{|A|B|}\n\hline\n'
+        out.write('\\\\\\hline\n')
+    out.write('\end{longtable}\n')
+
+def make_room_session_table(out, S, day, withMises=False):
+    start = S.start
+    stime = S.start_time
+    etime = S.end_time
+    out.write(f'\n\\begin{{samepage}}\n\\section*{{{day}\hfill{stime}--{etime}}}\n')
+    session = S.number
+    out.write(f'\n\\begin{{center}}\huge\\bfseries {session}\end{{center}}\n')
+    out.write('\\begin{tabularx}{\linewidth}{|A|B|}\n\hline\n')
     for i in range(1,7):
-        contribution = get_contribution_info(row, i)
+        contribution = S.contribution(i)
         if contribution is not None:
             if (not withMises) and (session == 'RvML'):
                 if i == 1:
                     cstart = start.strftime("%H:%M")
-                    inputs += f'{cstart}&\n'
-                    inputs += '\\textbf{Price winner(s) and title(s) will be announced in the Opening}\\\\\hline\n'
+                    out.write(f'{cstart}&\n')
+                    out.write('\\textbf{Price winner(s) and title(s) will be announced in the Opening}\\\\\hline\n')
             else:
-                if contribution["duration"] == 0: # set explicitly for posters
+                if contribution.duration == 0: # set explicitly for posters
                     cstart = start.strftime("%H:%M")
                 else:
-                    cstart = dt.datetime.fromisoformat(contribution["start"]).strftime("%H:%M")
-                inputs += f'{cstart}&\n'
-                inputs += f'\\textbf{{{contribution["title"]}}}\\newline\\textit{{{contribution["presenter"]}}}\\\\\hline\n'
+                    cstart = contribution.start.strftime("%H:%M")
+                out.write(f'{cstart}&\n')
+                out.write(f'\\textbf{{{contribution.title}}}\\newline\\textit{{{contribution.presenter}}}\\\\\hline\n')
         else:
             if (session == 'RvML') and (i == 1):
                 cstart = start.strftime("%H:%M")
-                inputs += f'{cstart}&\n'
-                inputs += '\\textbf{Price winner(s) and title(s) will be announced in the Opening}\\\\\hline\n'
+                out.write(f'{cstart}&\n')
+                out.write('\\textbf{Price winner(s) and title(s) will be announced in the Opening}\\\\\hline\n')
 
-    inputs += '\end{tabularx}\n\end{samepage}\n'
+    out.write('\end{tabularx}\n\end{samepage}\n')
 
-    return utf8_clean(inputs)
 ################################################################################
 # top-level routines for generating the book of abstracts and daily session    #
 # program                                                                      #
 ################################################################################
-def make_boa(df, withMises=False):
-    # Filter by the categories desired as chapter in the BoA
-    DFG              = df[df['session_short'].str.startswith('DFG')].sort_values(by='session_short')
-    Prandtl          = df[df['session_short'].str.startswith('PML')].sort_values(by='session_short')
-    Plenaries        = df[df['session_short'].str.startswith('PL')].sort_values(by='session_short')
-    Minisymposia     = df[df['session_short'].str.startswith('MS')].sort_values(by='session_short')
-    YoungResearchers = df[df['session_short'].str.startswith('YRM')].sort_values(by='session_short')
-    Contributed      = df[df['session_short'].str.startswith('S')].sort_values(by='session_short')
-
-    # Read the relevant Organizer information exported from ConfTool
-    Organizers = pd.read_csv('CSV/organizers.csv',
-                            sep=';',
-                            quotechar='"',
-                            usecols=['track_type', 'name', 'firstname', 'organisation'])
-    # drop everyone whos not a session organizer and sort by sections
-    Organizers = Organizers[Organizers.track_type.notnull()].sort_values(by='track_type')
+def make_boa(conference, withMises=False, jobs=1, chapters=False):
+    # Index the sessions and organizers once, every chapter and section is a
+    # lookup in them
+    sessions = index_sessions(conference)
+    Organizers = PrefixIndex(conference.organizers, 'track_type')
 
     outdir  = './LaTeX/Book_of_abstracts/Sessions/'
-    inputs  = '\chapter{Prandtl Memorial Lecture and Plenary~Lectures}\n'
-    inputs += write_PML(Prandtl, outdir)
-    inputs += write_PL(Plenaries, outdir)
+    chapdir = './LaTeX/Book_of_abstracts/Chapters/'
+    parts  = [('contents', '\\tableofcontents\n')]
+    plenary  = '\chapter{Prandtl Memorial Lecture and Plenary~Lectures}\n'
+    plenary += write_PML(sessions.startswith('PML'), outdir)
+    plenary += write_PL(sessions.startswith('PL'), outdir)
+    parts.append(('plenary', plenary))
     if withMises:
-        vonMises = df[df['session_short'].str.startswith('RvML')].sort_values(by='session_short')
-        inputs  += '\chapter{Richard von Mises Price Lecture(s)}\n'
-        inputs  += write_RvML(vonMises, outdir)
-    inputs += '\chapter{Minisymposia and Young~Researchers~Minisymposia}\n'
-    inputs += write_minis(Organizers, Minisymposia, YoungResearchers, outdir)
-    inputs += '\chapter{DFG Programs}\n'
-    inputs += write_dfg(Organizers, DFG, outdir)
-    inputs += '\chapter{Contributed Sessions}\n'
-    inputs += write_sections(Organizers, Contributed, outdir)
-
-    boa = open('./LaTeX/Book_of_abstracts/BookOfAbstracts.tex', 'w', encoding = 'utf-8')
+        mises  = '\chapter{Richard von Mises Price Lecture(s)}\n'
+        mises += write_RvML(sessions.startswith('RvML'), outdir)
+        parts.append(('mises', mises))
+    sectioned = [('minis', '\chapter{Minisymposia and Young~Researchers~Minisymposia}\n', minis_sections(sessions)),
+                 ('dfg', '\chapter{DFG Programs}\n', dfg_sections(sessions)),
+                 ('contributed', '\chapter{Contributed Sessions}\n', contributed_sections())]
+    fnames = iter(write_sections([section for _, _, sections in sectioned for section in sections],
+                                 sessions, Organizers, outdir, jobs=jobs))
+    for part, chapter, sections in sectioned:
+        for _ in sections:
+            chapter += f'\\input{{{next(fnames)}}}\n'
+        parts.append((part, chapter))
+    parts.append(('index', '\\printindex\n'))
+
     contents = '''\\documentclass[colorlinks]{gamm-boa}
 
 \\begin{document}
-\\tableofcontents
 CONTENTS
-\\printindex
 \\end{document}
 '''
-    contents = contents.replace('CONTENTS', inputs)
-    boa.write(contents)
-    boa.close()
-
-def make_dsp(df, withMises=False):
-    df = df.sort_values(by='session_start')
-    session_starts = df['session_start'].unique()
+    if chapters:
+        # the book only \include's its parts, so that they can also be
+        # compiled one by one (see RunMe.py --chapters, experimental)
+        for part, text in parts:
+            write_tex(f'{chapdir}{part}.tex', text)
+        inputs = '\n'.join(f'\\include{{Chapters/{part}}}' for part, _ in parts)
+    else:
+        inputs = ('\\tableofcontents\n' + ''.join(text for _, text in parts[1:-1])
+                  + '\n\\printindex')
+    write_tex('./LaTeX/Book_of_abstracts/BookOfAbstracts.tex', contents.replace('CONTENTS', inputs))
 
-    dsp = open('./LaTeX/Daily_Scientific_Program/Daily_Scientific_Program.tex', 'w', encoding = 'utf-8')
+    # the \input list of a part is exactly the set of section files it
+    # depends on, the parts come back in the order of the book
+    return [(part, ([f'{chapdir}{part}.tex'] if chapters else [])
+                   + [outdir + fname + ('' if fname.endswith('.tex') else '.tex')
+                      for fname in re.findall(r'\\input\{([^}]*)\}', text)])
+            for part, text in parts]
 
-    inputs = ''
-    old_day = ''
-    for session in session_starts:
-        start = dt.datetime.fromisoformat(session)
-        day = start.strftime("%A, %B %d")
-        if old_day != day:
-            old_day = day
-            inputs += f'\\chapter{{{day}}}\n'
-        #inputs += f'\\section*{{{start.strftime("%H:%M")}}}\n'
-        SAT = df[df['session_start'] == session].sort_values(by='session_short') # session at time
-        length = get_duration(session, SAT['session_end'].values[0])
-        match len(SAT):
-            case 1: # only one parallel session, i.e. Plenary or Poster
-                if SAT['session_short'].values[0].startswith('PL') | SAT['session_short'].values[0].startswith('PML') | SAT['session_short'].values[0].startswith('RvML'):
-                    inputs += make_session_table(SAT, start, int(1))
-                if SAT['session_short'].values[0].startswith('Poster'):
-                    inputs += make_session_table(SAT, start, int(16)) # TODO 16 seems to be the maximum for this conference. This may need fixing
-                if SAT['session_short'].values[0].startswith('RvML'):
-                    inputs += make_session_table(SAT, start, 2, withMises=withMises)
-            case _:
-                num_slots = length / 20
-                inputs += make_session_table(SAT, start, int(num_slots))
-    contents = '''\documentclass[colorlinks]{gamm-dsp}
+def make_dsp(conference, withMises=False):
+    template = '''\documentclass[colorlinks]{gamm-dsp}
 
 \\begin{document}
 \\tableofcontents
@@ -535,36 +694,308 @@ CONTENTS
 \printindex
 \end{document}
 '''
-    contents = contents.replace('CONTENTS', inputs)
-    dsp.write(contents)
-    dsp.close()
-
-def make_room_plans(df, withMises=False):
-    outdir = './LaTeX/Daily_Scientific_Program/rooms/'
-    df = df.sort_values(by='session_room')
-
-    template_file = open('./LaTeX/Daily_Scientific_Program/room_template.tex', 'r', encoding = 'utf-8')
-    template = template_file.read()
-    template_file.close()
-
-    rooms = df['session_room'].unique()
-    for room in rooms:
-        print(f'Generating room: {room}\n')
-        sessions = df[df['session_room'] == room].sort_values(by='session_start')
-        room = room.replace('/', '-')
-        room_file = open(f'{outdir}{room}.tex', 'w', encoding = 'utf-8')
+    head, tail = template.split('CONTENTS')
+    with TexFile('./LaTeX/Daily_Scientific_Program/Daily_Scientific_Program.tex') as out:
+        out.write_raw(head)
         old_day = ''
-        inputs = ''
-        for _, row in sessions.iterrows():
-            day = dt.datetime.fromisoformat(row['session_start'].replace(' ','T')).strftime("%A, %B %d")
+        for start, SAT in timeline(conference): # sessions at time
+            day = start.strftime("%A, %B %d")
             if old_day != day:
                 old_day = day
-                inputs += '\n\pagebreak[4]'
-            inputs += make_room_session_table(row, day, withMises=withMises)
-        contents = template.replace('ROOM', room)
-        contents = contents.replace('CONTENTS', inputs)
-        room_file.write(contents)
+                out.write_raw(f'\\chapter{{{day}}}\n')
+            #out.write_raw(f'\\section*{{{start.strftime("%H:%M")}}}\n')
+            length = get_duration(start, SAT[0].end)
+            match len(SAT):
+                case 1: # only one parallel session, i.e. Plenary or Poster
+                    if SAT[0].number.startswith('PL') | SAT[0].number.startswith('PML') | SAT[0].number.startswith('RvML'):
+                        make_session_table(out, SAT, start, int(1))
+                    if SAT[0].number.startswith('Poster'):
+                        make_session_table(out, SAT, start, int(16)) # TODO 16 seems to be the maximum for this conference. This may need fixing
+                    if SAT[0].number.startswith('RvML'):
+                        make_session_table(out, SAT, start, 2, withMises=withMises)
+                case _:
+                    num_slots = length / 20
+                    make_session_table(out, SAT, start, int(num_slots))
+        out.write_raw(tail)
+
+################################################################################
+# Room plans. The sessions are grouped by room and day in one pass, each room  #
+# plan is rendered and written by its own task, in a pool of worker processes #
+# for jobs > 1. `rooms` restricts the generation to the given rooms, e.g.      #
+# after a room change on site.                                                 #
+################################################################################
+def room_file_name(room):
+    return room.replace('/', '-')
 
+def group_rooms(conference):
+    rooms = {}
+    for S in sorted(conference.sessions, key=attrgetter('room', 'start')):
+        days = rooms.setdefault(S.room, {})
+        days.setdefault(S.start.strftime("%A, %B %d"), []).append(S)
+    return rooms
+
+def write_room_plan(room, days, template, outdir, withMises=False):
+    print(f'Generating room: {room}\n')
+    room = room_file_name(room)
+    fname = f'{outdir}{room}.tex'
+    head, tail = template.replace('ROOM', room).split('CONTENTS')
+    with TexFile(fname) as out:
+        out.write_raw(head)
+        for day, sessions in days.items():
+            out.write_raw('\n\pagebreak[4]')
+            for S in sessions:
+                make_room_session_table(out, S, day, withMises=withMises)
+        out.write_raw(tail)
+    return fname
+
+# returns the room plan file of every generated room
+def make_room_plans(conference, withMises=False, rooms=None, jobs=1):
+    outdir = './LaTeX/Daily_Scientific_Program/rooms/'
+
+    with open('./LaTeX/Daily_Scientific_Program/room_template.tex', 'r', encoding = 'utf-8') as f:
+        template = f.read()
+
+    plans = group_rooms(conference)
+    if rooms is not None:
+        known = set(plans) | {room_file_name(room) for room in plans}
+        unknown = [room for room in rooms if room not in known]
+        if unknown:
+            raise SystemExit(f'unknown room(s): {", ".join(unknown)}')
+        plans = {room: days for room, days in plans.items()
+                 if room in rooms or room_file_name(room) in rooms}
+
+    tasks = [(room, days, template, outdir, withMises) for room, days in plans.items()]
+    fnames = run_tasks(write_room_plan, tasks, jobs, stage='room_plan')
+    return {room_file_name(room): fname for room, fname in zip(plans, fnames)}
+
+################################################################################
+# Loading the ConfTool exports and running all generators. These are the      #
+# entry points for RunMe.py, which passes the loaded frames on in-process.    #
+################################################################################
+# The sessions export has far more columns than the generators use. Only the
+# session columns below and the p<N>_* fields of contribution_fields are read,
+# all of them as strings, and the start and end times are parsed into datetime
+# columns in one go. The C engine needs less peak memory than the pyarrow CSV
+# engine (see benchmarks/bench_load.py), pyarrow is only used on request.
+session_columns = ['session_short', 'session_title', 'session_room',
+                   'session_start', 'session_end', 'chair1', 'chair2', 'chair3']
+contribution_column = re.compile(r'p\d+_(' + '|'.join(contribution_fields) + ')')
+
+csv_engine = 'c'
+
+try:
+    import pyarrow
+    cache_format = 'parquet'
+except ImportError:
+    cache_format = 'pickle'
+
+def sessions_schema(fname):
+    with open(fname, 'r', encoding='utf-8') as f:
+        header = next(csv.reader(f, delimiter=';', quotechar='"'))
+    missing = [col for col in session_columns if col not in header]
+    if missing:
+        raise SystemExit(f'{fname} is missing the columns {", ".join(missing)}')
+    return [col for col in header if col in session_columns or contribution_column.fullmatch(col)]
+
+def load_sessions(fname='CSV/sessions.csv', engine=None):
+    columns = sessions_schema(fname)
+    df = pd.read_csv(fname, sep=';', quotechar='"', usecols=columns,
+                     dtype={col: 'str' for col in columns}, engine=engine or csv_engine)
+    times = [col for col in columns if col.endswith(('_start', '_end'))]
+    parsed = pd.to_datetime(df[times].to_numpy().ravel(), format='ISO8601')
+    df[times] = parsed.to_numpy().reshape(len(df), len(times))
+    return df
+
+def load_organizers(fname='CSV/organizers.csv'):
+    # Read the relevant Organizer information exported from ConfTool
+    organizers = pd.read_csv(fname,
+                             sep=';',
+                             quotechar='"',
+                             usecols=['track_type', 'name', 'firstname', 'organisation'])
+    # drop everyone whos not a session organizer and sort by sections
+    return organizers[organizers.track_type.notnull()].sort_values(by='track_type')
+
+################################################################################
+# On-disk cache of the normalized schedule (sessions, organizers and the long  #
+# contribution table with converted abstracts). It is keyed by the hashes of  #
+# sessions.csv, organizers.csv and the source of the loading and conversion   #
+# code, so it is dropped as soon as the exports or html2latex change. Without #
+# pyarrow the frames are pickled instead of stored as Parquet. The abstract   #
+# cache lives next to it and keeps the conversions of unchanged abstracts     #
+# when only some of them changed.                                             #
+################################################################################
+cache_dir = './CSV/schedule_cache/'
+cache_tables = ['sessions', 'organizers', 'contributions']
+abstract_cache_file = f'{cache_dir}abstracts.json'
+
+def converter_version():
+    sources = [abstract_version()]
+    sources += [inspect.getsource(fun) for fun in
+                (sessions_schema, load_sessions, load_organizers, get_contributions)]
+    sources += [repr(session_columns), repr(contribution_fields)]
+    return hashlib.sha256('\n'.join(sources).encode()).hexdigest()
+
+def schedule_key(sessions_file, organizers_file):
+    key = {'converter': converter_version(), 'format': cache_format}
+    for name, fname in [('sessions', sessions_file), ('organizers', organizers_file)]:
+        with open(fname, 'rb') as f:
+            key[name] = hashlib.sha256(f.read()).hexdigest()
+    return key
+
+def cache_path(table):
+    return f'{cache_dir}{table}.{cache_format}'
+
+def read_cache(key):
+    try:
+        with open(f'{cache_dir}key.json', 'r', encoding='utf-8') as f:
+            if json.load(f) != key:
+                return None
+        if cache_format == 'parquet':
+            return tuple(pd.read_parquet(cache_path(table)) for table in cache_tables)
+        return tuple(pd.read_pickle(cache_path(table)) for table in cache_tables)
+    except (FileNotFoundError, json.JSONDecodeError, OSError, ValueError):
+        return None
+
+def write_cache(key, frames):
+    os.makedirs(cache_dir, exist_ok=True)
+    # the key is written last, an interrupted write leaves no valid entry
+    try:
+        os.remove(f'{cache_dir}key.json')
+    except FileNotFoundError:
+        pass
+    for table, frame in zip(cache_tables, frames):
+        if cache_format == 'parquet':
+            frame.to_parquet(cache_path(table))
+        else:
+            frame.to_pickle(cache_path(table))
+    with open(f'{cache_dir}key.json', 'w', encoding='utf-8') as f:
+        json.dump(key, f, indent=2)
+
+# returns the sessions, organizers and contributions frames, from the cache if
+# neither the exports nor the conversion code changed since it was written
+def load_schedule(sessions_file='CSV/sessions.csv', organizers_file='CSV/organizers.csv',
+                  use_cache=True, engine=None):
+    key = schedule_key(sessions_file, organizers_file)
+    if use_cache:
+        frames = read_cache(key)
+        if frames is not None:
+            print(f'Using the cached schedule in {cache_dir}')
+            return frames
+    if use_cache:
+        abstracts.load(abstract_cache_file, abstract_version())
+    with profiler.stage('load_sessions'):
+        df = load_sessions(sessions_file, engine)
+    with profiler.stage('load_organizers'):
+        organizers = load_organizers(organizers_file)
+    with profiler.stage('get_contributions'):
+        contributions = get_contributions(df)
+    frames = (df, organizers, contributions)
+    print(f'Abstract conversion: {abstracts.report()}')
+    if use_cache:
+        abstracts.save(abstract_cache_file, abstract_version())
+        write_cache(key, frames)
+    return frames
+
+# generates all files, or only the plans of the given rooms; returns the
+# room plan file of every generated room
+def generate(df, organizers, contributions, withMises=False, jobs=1, rooms=None, chapters=False):
+    with profiler.stage('build_conference', python=True):
+        conference = build_conference(df, organizers, contributions)
+    return generate_conference(conference, withMises=withMises, jobs=jobs, rooms=rooms,
+                               chapters=chapters)
+
+# with `chapters` the book of abstracts is written as \include'd parts for
+# RunMe.py --chapters
+def generate_conference(conference, withMises=False, jobs=1, rooms=None, chapters=False):
+    if rooms is not None:
+        print('\nGenerating Room Plan LaTeX files\n')
+        with profiler.stage('make_room_plans', python=True):
+            room_files = make_room_plans(conference, withMises=withMises, rooms=rooms, jobs=jobs)
+        update_dependency_graph(room_files)
+        return room_files
+
+    print('\nGenerating book of abstracts LaTeX files\n')
+    with profiler.stage('make_boa', python=True):
+        boa_parts = make_boa(conference, withMises=withMises, jobs=jobs, chapters=chapters)
+    print('\nGenerating Session Table LaTeX files\n')
+    with profiler.stage('make_dsp', python=True):
+        make_dsp(conference, withMises=withMises)
+    print('\nGenerating Room Plan LaTeX files\n')
+    with profiler.stage('make_room_plans', python=True):
+        room_files = make_room_plans(conference, withMises=withMises, jobs=jobs)
+
+    write_dependency_graph(boa_parts, room_files, chapters)
+    return room_files
+
+################################################################################
+# Incremental regeneration for the watch mode of RunMe.py. The previous and    #
+# the new schedule model are compared session by session. A changed session    #
+# rewrites the section (or plenary) files of the book of abstracts holding     #
+# it, and if anything the daily program prints changed (its number, room and   #
+# times or the titles, speakers and times of its talks) also the daily         #
+# program and the plans of its old and new room. Added or removed sessions     #
+# and rooms and changed organizers regenerate everything.                      #
+################################################################################
+# a session as far as the daily program and the room plans print it
+def program_view(S):
+    return (S.number, S.room, S.start, S.end, S.start_time, S.end_time,
+            tuple((C.idx, C.title, C.presenter, C.start, C.end, C.start_time, C.duration, C.slot)
+                  for C in S.contributions))
+
+# returns the numbers of the changed sessions, the numbers of those whose
+# program entry changed and the rooms these were and are in, or None if the
+# changes need a full generation
+def schedule_changes(previous, conference):
+    if ([S.number for S in previous.sessions] != [S.number for S in conference.sessions]
+            or {S.room for S in previous.sessions} != {S.room for S in conference.sessions}
+            or previous.organizers != conference.organizers):
+        return None
+    book, program, rooms = set(), set(), set()
+    for old, new in zip(previous.sessions, conference.sessions):
+        if old == new:
+            continue
+        book.add(new.number)
+        if program_view(old) != program_view(new):
+            program.add(new.number)
+            rooms.update({old.room, new.room})
+    return book, program, rooms
+
+# regenerates the files affected by the changes from the `previous` model,
+# returns the room plan file of every regenerated room
+def regenerate(previous, conference, withMises=False, jobs=1, chapters=False):
+    changes = schedule_changes(previous, conference)
+    if changes is None:
+        print('Sessions, rooms or organizers were added or removed, regenerating all files')
+        return generate_conference(conference, withMises=withMises, jobs=jobs, chapters=chapters)
+    book, program, rooms = changes
+    if not book:
+        print('No session changed')
+        return {}
+    print(f'Changed sessions: {", ".join(sorted(book))}')
+
+    sessions = index_sessions(conference)
+    outdir = './LaTeX/Book_of_abstracts/Sessions/'
+    with profiler.stage('make_boa', python=True):
+        if any(number.startswith(('PML', 'PL', 'RvML')) for number in book):
+            write_PML(sessions.startswith('PML'), outdir)
+            write_PL(sessions.startswith('PL'), outdir)
+            if withMises:
+                write_RvML(sessions.startswith('RvML'), outdir)
+        sections = [(sec, silent) for sec, silent in boa_sections(sessions)
+                    if any(number.startswith(sec) for number in book)]
+        write_sections(sections, sessions, PrefixIndex(conference.organizers, 'track_type'),
+                       outdir, jobs=jobs)
+    if program:
+        print('\nGenerating Session Table LaTeX files\n')
+        with profiler.stage('make_dsp', python=True):
+            make_dsp(conference, withMises=withMises)
+    room_files = {}
+    if rooms:
+        print('\nGenerating Room Plan LaTeX files\n')
+        with profiler.stage('make_room_plans', python=True):
+            room_files = make_room_plans(conference, withMises=withMises, rooms=sorted(rooms), jobs=jobs)
+        update_dependency_graph(room_files)
+    return room_files
 
 ################################################################################
 # Main function                                                                #
@@ -572,6 +1003,13 @@ def make_room_plans(df, withMises=False):
 def main():
     parser = argparse.ArgumentParser(description='Generate PDFs for conference materials.')
     parser.add_argument('-m', '--withMises', action='store_true', help='onclude von Mises lecturer(s) and title(s)')
+    parser.add_argument('--no-cache', action='store_true', help='parse the CSV files even if the cached schedule is up to date')
+    parser.add_argument('--pyarrow', action='store_true', help='parse sessions.csv with the pyarrow CSV engine (needs more peak memory than the default C engine)')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of processes writing the book of abstracts sections and room plans')
+    parser.add_argument('--room', action='append', metavar='ROOM', help='only generate the plan of this room (repeatable)')
+    parser.add_argument('--chapters', action='store_true', help='write the book of abstracts as \\include\'d parts for RunMe.py --chapters (experimental)')
+    parser.add_argument('--profile', metavar='FILE', help='append wall time, CPU time and peak memory of every stage to FILE (.json or .csv)')
+    parser.add_argument('--cprofile', metavar='DIR', help='also dump a cProfile of every Python stage to DIR (use -j 1 to include the section and room plan writers)')
     args = parser.parse_args()
 
     if args.withMises:
@@ -581,15 +1019,20 @@ def main():
 
     print(f'\nInclude von Mises Prize lectures: {withMises}\n\n')
 
-    # Read the Sessions exported from ConfTool
-    df = pd.read_csv('CSV/sessions.csv', sep=';', quotechar='"')
+    if args.profile or args.cprofile:
+        profiler.enable(args.cprofile)
 
-    print('\nGenerating book of abstracts LaTeX files\n')
-    make_boa(df, withMises=withMises)
-    print('\nGenerating Session Table LaTeX files\n')
-    make_dsp(df, withMises=withMises)
-    print('\nGenerating Room Plan LaTeX files\n')
-    make_room_plans(df, withMises=withMises)
+    # Read the Sessions exported from ConfTool
+    try:
+        with profiler.stage('load_schedule', python=True):
+            frames = load_schedule(use_cache=not args.no_cache,
+                                   engine='pyarrow' if args.pyarrow else None)
+        generate(*frames, withMises=withMises, jobs=args.jobs, rooms=args.room, chapters=args.chapters)
+    finally:
+        if profiler.enabled:
+            profiler.summary()
+            if args.profile:
+                profiler.write(args.profile)
 
 if __name__ == "__main__":
     main()
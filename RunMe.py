@@ -3,38 +3,159 @@
 # Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
 # License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
 
-import subprocess
 import os
-import sys
-import argparse
+import json
+import time
+import hashlib
 import shutil
-from glob import glob
+import argparse
+
+import BoA_DSP_generator as generator
+import html2latex
+import schedule
+import check_html_tags
+import get_conftool_data as fetcher
+import diff_snapshots
+from schedule import build_conference
+from latex_build import Book, BuildError, Document, Format, Scheduler
+from profiling import profiler
 
+################################################################################
+# The documents to compile for each target. They are independent of each      #
+# other and are handed to the build scheduler together.                       #
+################################################################################
 def make_boa():
-    try:
-        os.chdir(os.path.join("LaTeX", "Book_of_abstracts"))
-        subprocess.check_call(["latexmk", "-pdf", "BookOfAbstracts.tex"])
-        shutil.copy("BookOfAbstracts.pdf", cwd)
-    finally:
-        os.chdir(cwd)
+    return [Document("BookOfAbstracts",
+                     os.path.join("LaTeX", "Book_of_abstracts"),
+                     "BookOfAbstracts.tex")]
 
 def make_dsp():
-    try:
-        os.chdir(os.path.join("LaTeX", "Daily_Scientific_Program"))
-        subprocess.check_call(["latexmk", "-pdf", "Daily_Scientific_Program.tex"])
-        shutil.copy("Daily_Scientific_Program.pdf", cwd)
-    finally:
-        os.chdir(cwd)
+    return [Document("Daily_Scientific_Program",
+                     os.path.join("LaTeX", "Daily_Scientific_Program"),
+                     "Daily_Scientific_Program.tex")]
 
 def make_room_plans():
+    workdir = os.path.join("LaTeX", "Daily_Scientific_Program", "rooms")
+    return [Document(os.path.splitext(tex_file)[0], workdir, tex_file)
+            for tex_file in sorted(os.listdir(workdir)) if tex_file.endswith(".tex")]
+
+################################################################################
+# The generator writes a dependency graph listing the generated and static    #
+# files every PDF is built from. We store the content hashes of these inputs  #
+# after each successful compilation and only recompile documents whose inputs #
+# changed since.                                                              #
+################################################################################
+graph_file = os.path.join("LaTeX", "dependencies.json")
+compiled_file = os.path.join("LaTeX", "last_compiled.json")
+
+def load_json(fname):
     try:
-        os.chdir(os.path.join("LaTeX", "Daily_Scientific_Program", "rooms"))
-        for tex_file in glob("*.tex"):
-            subprocess.check_call(["latexmk", "-pdf", tex_file])
-        for pdf_file in glob("*.pdf"):
-            shutil.copy(pdf_file, cwd)
-    finally:
-        os.chdir(cwd)
+        with open(fname, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_json(fname, data):
+    with open(f'{fname}.part', 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(f'{fname}.part', fname)
+
+def input_hashes(inputs):
+    hashes = {}
+    for fname in inputs:
+        try:
+            with open(fname, 'rb') as f:
+                hashes[fname] = hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            hashes[fname] = None
+    return hashes
+
+# returns the documents of the targets together with the hashes of their inputs,
+# without a dependency graph every document is compiled
+def select_documents(targets):
+    graph = load_json(graph_file)
+    if not graph:
+        builders = {"boa": make_boa, "dsp": make_dsp, "rooms": make_room_plans}
+        return [(document, target, None) for target in targets for document in builders[target]()]
+    return [(Document(name, entry["workdir"], entry["texfile"]), entry["target"],
+             input_hashes(entry["inputs"]))
+            for name, entry in sorted(graph.items()) if entry["target"] in targets]
+
+################################################################################
+# With --formats (experimental) the preamble of the book of abstracts and of   #
+# the daily program is dumped once into a precompiled format (see             #
+# latex_build.py). The room plans have none, their preambles differ in the    #
+# room name.                                                                  #
+################################################################################
+formats = {
+    "boa": Format("gamm-boa", os.path.join("LaTeX", "Book_of_abstracts"), "BookOfAbstracts.tex"),
+    "dsp": Format("gamm-dsp", os.path.join("LaTeX", "Daily_Scientific_Program"), "Daily_Scientific_Program.tex"),
+}
+
+################################################################################
+# With --chapters (experimental) the book of abstracts is generated as         #
+# \include'd parts and compiled part by part (see Book in latex_build.py):     #
+# only parts whose inputs changed since their last compilation, and the parts  #
+# whose page numbers they move, are compiled.                                  #
+################################################################################
+def select_parts(name):
+    entry = load_json(graph_file).get(name, {})
+    return [(part, input_hashes(inputs)) for part, inputs in entry.get("parts", [])]
+
+################################################################################
+# The fetcher records content hashes of all exports in CSV/manifest.json. We   #
+# remember the hashes of the generator inputs each PDF was last built from     #
+# (the exports, the static LaTeX files of the target and the source of the     #
+# generator), so that runs without changes skip generation and compilation.    #
+################################################################################
+manifest_file = os.path.join("CSV", "manifest.json")
+build_stamp_file = os.path.join("CSV", "last_build.json")
+target_pdfs = {
+    "boa":   ["BookOfAbstracts.pdf"],
+    "dsp":   ["Daily_Scientific_Program.pdf"],
+    "rooms": [],  # room names are only known after generation
+}
+static_inputs = {
+    "boa":   generator.static_inputs["boa"],
+    "dsp":   generator.static_inputs["dsp"],
+    "rooms": ["./LaTeX/Daily_Scientific_Program/room_template.tex"],
+}
+generator_sources = [generator.__file__, html2latex.__file__, schedule.__file__]
+
+def generator_version():
+    digest = hashlib.sha256()
+    for fname in generator_sources:
+        with open(fname, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def input_stamp(args, target):
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if "sessions" not in manifest or "organizers" not in manifest:
+        return None
+    return {
+        "sessions":   manifest["sessions"],
+        "organizers": manifest["organizers"],
+        "withMises":  args.withMises,
+        "chapters":   args.chapters,
+        "static":     input_hashes(static_inputs[target]),
+        "generator":  generator_version(),
+    }
+
+def load_build_stamps():
+    return load_json(build_stamp_file)
+
+def save_build_stamps(stamps):
+    save_json(build_stamp_file, stamps)
+
+def up_to_date(target, stamp, stamps):
+    if stamp is None or stamps.get(target) != stamp:
+        return False
+    return all(os.path.exists(pdf) for pdf in target_pdfs[target])
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Generate PDFs for conference materials.')
@@ -43,31 +164,218 @@ def parse_arguments():
     parser.add_argument('-r', '--rooms', action='store_true', help='Generate room plans')
     parser.add_argument('-a', '--all', action='store_true', help='Generate all PDFs. This is equivalent to "no option", i.e. the default behavior.')
     parser.add_argument('-m', '--withMises', action='store_true', help='Generate PDFs including the von Mises Lecturer(s). Needs to be used together with one of the other options for target selection.')
+    parser.add_argument('-f', '--force', action='store_true', help='Regenerate and recompile even if nothing changed.')
+    parser.add_argument('--no-cache', action='store_true', help='Parse sessions.csv and organizers.csv even if the cached schedule is up to date.')
+    parser.add_argument('--pyarrow', action='store_true', help='Parse sessions.csv with the pyarrow CSV engine (needs more peak memory than the default C engine).')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='Number of documents compiled in parallel (default: number of CPUs).')
+    parser.add_argument('--generator-jobs', type=int, default=1, metavar='N', help='Number of processes writing the book of abstracts sections and room plans (default: 1).')
+    parser.add_argument('--chapters', action='store_true', help='Compile the book of abstracts chapter by chapter, only recompiling changed chapters, and stitch them into BookOfAbstracts.pdf (without hyperlinks). Experimental: page numbers, table of contents and speaker index have not been checked with pdflatex yet.')
+    parser.add_argument('--formats', action='store_true', help='Compile against precompiled preamble formats dumped with mylatexformat (experimental, see README.md).')
+    parser.add_argument('--room', action='append', metavar='ROOM', help='Regenerate and recompile only the plan of this room, e.g. after a room change on site (repeatable, ignores the other targets).')
+    parser.add_argument('--no-lint', action='store_true', help='Generate and compile even if check_html_tags.py finds fields that would stop pdflatex.')
+    parser.add_argument('--profile', metavar='FILE', help='Append wall time, CPU time and peak memory of every stage (export, section file, room plan, latexmk run, ...) to FILE, a .json or .csv report.')
+    parser.add_argument('--cprofile', metavar='DIR', help='Also dump a cProfile of every Python stage to DIR/<stage>.prof.')
+    parser.add_argument('--watch', type=float, nargs='?', const=60.0, metavar='SECONDS', help='Keep running and poll ConfTool every SECONDS (default: 60), regenerating and recompiling only what changed.')
+    parser.add_argument('--polls', type=int, metavar='N', help='With --watch, stop after N polls.')
     return parser.parse_args()
 
-def main():
-    args = parse_arguments()
-    
+def select_targets(args):
+    targets = []
+    if args.boa:
+        targets.append("boa")
+    if args.dsp:
+        targets.append("dsp")
+    if args.rooms:
+        targets.append("rooms")
+    if args.all or not targets:
+        targets = ["boa", "dsp", "rooms"]
+    if args.room:
+        targets = ["rooms"]
+    return targets
+
+# runs the checks of check_html_tags.py on the schedule, returns False after
+# reporting the fields that would stop pdflatex
+def lint(args, frames):
+    if args.no_lint:
+        return True
+    with profiler.stage('lint', python=True):
+        problems = check_html_tags.lint(*frames)
+    check_html_tags.report(problems)
+    return len(problems) == 0
+
+# compile the documents of the targets whose inputs changed since their last
+# compilation, or all of them with `force`; stops with a BuildError at the
+# first failing document
+def compile_documents(args, targets, room_files, force=False):
+    compiled = load_json(compiled_file)
+    documents = []
+    hashes = {}
+    book = None
+    for document, target, inputs in select_documents(targets):
+        if args.formats and target in formats:
+            document.fmt = formats[target]
+        if args.room and document.texfile not in map(os.path.basename, room_files.values()):
+            continue
+        if args.chapters and target == "boa":
+            parts = select_parts(document.name)
+            if parts:
+                book = document
+                continue
+        if (not force and inputs is not None and compiled.get(document.name) == inputs
+                and os.path.exists(document.pdf)):
+            if not os.path.exists(os.path.basename(document.pdf)):
+                shutil.copy(document.pdf, os.getcwd())
+            continue
+        documents.append(document)
+        hashes[document.name] = inputs
+    print(f"Compiling {len(documents)} document(s) whose inputs changed")
+
+    def record(document):
+        if hashes[document.name] is not None:
+            compiled[document.name] = hashes[document.name]
+
+    scheduler = Scheduler(args.jobs)
+    try:
+        with profiler.stage('compile'):
+            scheduler.run(documents, os.getcwd(), done=record)
+        if book is not None:
+            changed = [part for part, inputs in parts
+                       if force or compiled.get(f"{book.name}-{part}") != inputs]
+            for part, inputs in parts:
+                hashes[f"{book.name}-{part}"] = inputs
+            hashes[f"{book.name}-stitched"] = None
+            print(f"Compiling {book.name} by chapters, changed: {', '.join(changed) or 'none'}")
+            with profiler.stage('compile_chapters'):
+                Book(book, [part for part, _ in parts]).build(scheduler, changed, os.getcwd(), done=record)
+    finally:
+        save_json(compiled_file, compiled)
+
+def build(args):
     # Fetch data from ConfTool Pro
-    subprocess.check_call([sys.executable, "get_conftool_data.py"])
+    with profiler.stage('fetch', python=True):
+        changed = fetcher.fetch()
+    if {"sessions", "organizers"} & set(changed):
+        with profiler.stage('diff', python=True):
+            diff_snapshots.report_latest()
+
+    targets = select_targets(args)
+    stamp = {target: input_stamp(args, target) for target in targets}
+    stamps = load_build_stamps()
+    if not args.force and not args.room:
+        skipped = [target for target in targets if up_to_date(target, stamp[target], stamps)]
+        if skipped:
+            print(f"Exports, LaTeX files and generator unchanged, skipping: {', '.join(skipped)}")
+        targets = [target for target in targets if target not in skipped]
+        if not targets:
+            return
 
     # Create LaTeX files
-    if args.withMises:
-        subprocess.check_call([sys.executable, "BoA_DSP_generator.py", "--withMises"])
-    else:
-        subprocess.check_call([sys.executable, "BoA_DSP_generator.py"])
+    print(f'\nInclude von Mises Prize lectures: {args.withMises}\n\n')
+    with profiler.stage('load_schedule', python=True):
+        frames = generator.load_schedule(use_cache=not args.no_cache,
+                                         engine='pyarrow' if args.pyarrow else None)
+    if not lint(args, frames):
+        raise SystemExit("Stopped before compiling, fix these fields in ConfTool (or use --no-lint)")
+    room_files = generator.generate(*frames, withMises=args.withMises, jobs=args.generator_jobs,
+                                    rooms=args.room, chapters=args.chapters)
 
-    if args.boa:
-        make_boa()
-    if args.dsp:
-        make_dsp()
-    if args.rooms:
-        make_room_plans()
-    if args.all or not any(vars(args).values()):
-        make_boa()
-        make_dsp()
-        make_room_plans()
+    try:
+        compile_documents(args, targets, room_files, force=args.force)
+    except BuildError as e:
+        print(e.log_tail())
+        raise SystemExit(f"Build stopped: {e}")
+
+    # after a partial room update the other rooms may still be outdated
+    if not args.room:
+        for target in targets:
+            if stamp[target] is not None:
+                stamps[target] = stamp[target]
+        save_build_stamps(stamps)
+
+################################################################################
+# With --watch RunMe.py keeps running and polls ConfTool every SECONDS. The    #
+# schedule model of the last build stays in memory, and after a change of      #
+# sessions.csv or organizers.csv only the files of the changed sessions are    #
+# regenerated (see regenerate() in BoA_DSP_generator.py), so that only the     #
+# PDFs built from them are recompiled. A failing build is reported and the     #
+# watch goes on; the failed documents are compiled again after the next        #
+# change.                                                                      #
+################################################################################
+def watch(args):
+    url, password = fetcher.read_config()
+    targets = select_targets(args)
+    stamps = load_build_stamps()
+    conference = None
+    polls = 0
+    print(f'\nInclude von Mises Prize lectures: {args.withMises}')
+    print(f'Watching ConfTool every {args.watch:g}s, stop with Ctrl-C')
+    try:
+        while True:
+            polls += 1
+            print(f'\n[{time.strftime("%H:%M:%S")}] Polling ConfTool')
+            try:
+                with profiler.stage('fetch', python=True):
+                    changed = fetcher.fetch_all(url, password)
+            except fetcher.ExportError as e:
+                print(f'Fetching from ConfTool failed, the previous CSV files are kept:\n{e}')
+                # the exports that did arrive are saved already and would
+                # not count as changed on the next poll
+                changed = e.changed
+            if {"sessions", "organizers"} & set(changed):
+                with profiler.stage('diff', python=True):
+                    diff_snapshots.report_latest()
+            if conference is None or {"sessions", "organizers"} & set(changed):
+                first = conference is None
+                with profiler.stage('load_schedule', python=True):
+                    frames = generator.load_schedule(use_cache=not args.no_cache,
+                                         engine='pyarrow' if args.pyarrow else None)
+                if lint(args, frames):
+                    with profiler.stage('build_conference', python=True):
+                        model = build_conference(*frames)
+                    if first:
+                        room_files = generator.generate_conference(model, withMises=args.withMises,
+                                                                   jobs=args.generator_jobs,
+                                                                   chapters=args.chapters)
+                    else:
+                        room_files = generator.regenerate(conference, model, withMises=args.withMises,
+                                                          jobs=args.generator_jobs,
+                                                          chapters=args.chapters)
+                    conference = model
+                    try:
+                        compile_documents(args, targets, room_files, force=first and args.force)
+                    except BuildError as e:
+                        print(e.log_tail())
+                        print(f"Build failed: {e}, waiting for the next change")
+                    else:
+                        for target in targets:
+                            stamp = input_stamp(args, target)
+                            if stamp is not None:
+                                stamps[target] = stamp
+                        save_build_stamps(stamps)
+                else:
+                    print("Not compiling, waiting for these fields to be fixed in ConfTool")
+            if args.polls is not None and polls >= args.polls:
+                break
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        print('\nStopped watching')
+
+def main():
+    args = parse_arguments()
+    if args.watch is not None and args.room:
+        raise SystemExit('--room cannot be combined with --watch')
+    if args.profile or args.cprofile:
+        profiler.enable(args.cprofile)
+    try:
+        if args.watch is not None:
+            watch(args)
+        else:
+            build(args)
+    finally:
+        if profiler.enabled:
+            profiler.summary()
+            if args.profile:
+                profiler.write(args.profile)
 
 if __name__ == "__main__":
-    cwd = os.getcwd()
-    main()
\ No newline at end of file
+    main()
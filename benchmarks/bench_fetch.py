@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Compare serial and concurrent wall-clock time of get_conftool_data.py against
+# the fake ConfTool server, which also verifies that no nonce is used twice.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_conftool import serve
+
+fetcher = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'get_conftool_data.py')
+
+def run_fetch(workdir, jobs):
+    start = time.perf_counter()
+    subprocess.check_call([sys.executable, fetcher, '--jobs', str(jobs)],
+                          cwd=workdir, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serial vs. concurrent ConfTool exports.')
+    parser.add_argument('-d', '--datadir', default='CSV', help='directory with the CSV files to serve')
+    parser.add_argument('-l', '--latency', type=float, default=0.5, help='simulated server time per export in seconds')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    secret = 'benchmark-secret'
+    server = serve(args.datadir, secret, latency=args.latency)
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, '.url'), 'w') as f:
+            f.write(server.url)
+        with open(os.path.join(workdir, '.secret'), 'w') as f:
+            f.write(secret)
+        for jobs, label in [(1, 'serial'), (5, 'concurrent')]:
+            times = [run_fetch(workdir, jobs) for _ in range(args.repeat)]
+            print(f'{label:>10}: best {min(times):.3f}s, mean {sum(times)/len(times):.3f}s')
+    print(f'{server.requests} requests, {server.rejected} rejected (reused nonce or wrong passhash)')
+    server.shutdown()
+    if server.rejected:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Compare the per document compile time of the generated documents with and
+# without the precompiled preamble formats. Run it from the repository root
+# after RunMe.py generated the LaTeX files. Every document is cleaned with
+# latexmk -C before each run, so that latexmk does the full number of passes;
+# the format itself is built before the timed runs.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import RunMe
+from latex_build import Scheduler
+
+def clean(documents):
+    for document in documents:
+        subprocess.call(['latexmk', '-C', document.texfile], cwd=document.workdir,
+                        stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+def compile_times(documents, fmt, jobs):
+    for document in documents:
+        document.fmt = fmt
+    clean(documents)
+    scheduler = Scheduler(jobs)
+    with tempfile.TemporaryDirectory() as destination:
+        scheduler.run(documents, destination)
+    return scheduler.times
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark compiling with and without precompiled formats.')
+    parser.add_argument('-t', '--target', choices=['boa', 'dsp'], default='dsp')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='documents compiled in parallel (1 gives undisturbed timings)')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    builders = {"boa": RunMe.make_boa, "dsp": RunMe.make_dsp}
+    documents = builders[args.target]()
+    fmt = RunMe.formats[args.target]
+    if not fmt.build(documents[0].texfile):
+        raise SystemExit(f'Could not build the format {fmt.name}, see {fmt.log}')
+
+    results = {'without': [], 'with': []}
+    for _ in range(args.repeat):
+        results['without'].append(compile_times(documents, None, args.jobs))
+        results['with'].append(compile_times(documents, fmt, args.jobs))
+
+    print(f'\n{"document":>28}  {"without":>8}  {"with":>8}  speedup')
+    total = {'without': 0.0, 'with': 0.0}
+    for document in documents:
+        times = {mode: min(run[document.name] for run in runs) for mode, runs in results.items()}
+        for mode in total:
+            total[mode] += times[mode]
+        print(f'{document.name:>28}  {times["without"]:7.2f}s  {times["with"]:7.2f}s  '
+              f'{times["without"] / times["with"]:6.2f}x')
+    print(f'{"total":>28}  {total["without"]:7.2f}s  {total["with"]:7.2f}s  '
+          f'{total["without"] / total["with"]:6.2f}x')
+
+if __name__ == "__main__":
+    main()
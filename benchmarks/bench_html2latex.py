@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Compare the single-pass html2latex with the former chain of replacements on
+# all abstracts of sessions.csv, both for equal output and for speed.
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from html2latex import HTML2LaTeX
+
+# the replacement chain html2latex used before the tokenizer
+def html2latex_chained(instr):
+    instr = instr.replace('<br />', '\\newline ')
+    instr = re.sub('<p[^><]*>', '', instr).replace('</p>', '\\par')
+    instr = instr.replace('<li>', '\\item ').replace('</li>', '')
+    instr = instr.replace('<ol>', '\\begin{enumerate}').replace('</ol>', '\\end{enumerate}')
+    instr = instr.replace('<ul>', '\\begin{itemize}').replace('</ul>', '\\end{itemize}')
+    instr = instr.replace('<sub>', '\\textsubscript{').replace('</sub>', '}')
+    instr = instr.replace('<sup>', '\\textsuperscript{').replace('</sup>', '}')
+    instr = instr.replace('<blockquote>', '\\begin{quote}').replace('</blockquote>', '\\end{quote}')
+    instr = instr.replace('<em>', '{\\em ').replace('</em>', '}')
+    instr = instr.replace('<strong>', '{\\bfseries ').replace('</strong>', '}')
+    instr = instr.replace('%', '\\percent')
+    return instr
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify and benchmark html2latex.')
+    parser.add_argument('-c', '--csv', default='CSV/sessions.csv')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, sep=';', quotechar='"', dtype=str)
+    abstracts = [value for col in df.columns if col.endswith('_abstract')
+                 for value in df[col].dropna()]
+    converter = HTML2LaTeX()
+
+    # malformed HTML is repaired by the tokenizer, so differences are expected there
+    differing = [a for a in abstracts if converter.convert(a) != html2latex_chained(a)]
+    print(f'{len(abstracts)} abstracts ({sum(map(len, abstracts)) / 2**20:.1f} MB), '
+          f'{len(differing)} with different output')
+    for tag, count in converter.unhandled.most_common():
+        print(f'  unhandled {tag}: {count}x')
+
+    timings = {}
+    for name, fun in [('chained', html2latex_chained), ('tokenizer', converter.convert)]:
+        timings[name] = min(timeit.repeat(lambda: [fun(a) for a in abstracts],
+                                          number=1, repeat=args.repeat))
+        print(f'{name:>10}: {timings[name]:.4f}s')
+    print(f'speedup: {timings["chained"] / timings["tokenizer"]:.1f}x')
+
+if __name__ == "__main__":
+    main()
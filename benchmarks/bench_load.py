@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Compare parse time and peak memory of the untyped full read of sessions.csv
+# with the column-pruned, typed load_sessions (C and pyarrow engine). Every
+# variant runs in a fresh interpreter, memory is the peak resident set size
+# above that of an interpreter that only imported the generator. ConfTool exports
+# many columns the generator never reads; --pad adds that many unused columns
+# per contribution to a copy of the file to mimic a full export.
+
+import argparse
+import csv
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+variants = ['full read', 'typed (c)', 'typed (pyarrow)']
+
+def load(variant, fname):
+    import BoA_DSP_generator as generator
+    match variant:
+        case 'full read':
+            return pd.read_csv(fname, sep=';', quotechar='"')
+        case 'typed (c)':
+            return generator.load_sessions(fname, engine='c')
+        case 'typed (pyarrow)':
+            return generator.load_sessions(fname, engine='pyarrow')
+
+# child process: print the parse time, the peak RSS in kB, the column count and
+# the size of the frame in bytes
+def measure(variant, fname):
+    import BoA_DSP_generator
+    if variant == 'import only':
+        print(0.0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 0, 0)
+        return
+    start = time.perf_counter()
+    df = load(variant, fname)
+    elapsed = time.perf_counter() - start
+    print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, df.shape[1],
+          df.memory_usage(deep=True).sum())
+
+def run(variant, fname):
+    out = subprocess.check_output([sys.executable, __file__, '--measure', variant, fname], text=True)
+    return [float(value) for value in out.split()]
+
+def pad(fname, n, outname):
+    with open(fname, 'r', encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f, delimiter=';', quotechar='"'))
+    header = rows[0]
+    extra = [f'{col[:-len("_title")]}_extra{k}' for col in header if col.endswith('_title')
+             and col.startswith('p') for k in range(n)]
+    with open(outname, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=';', quotechar='"', quoting=csv.QUOTE_ALL)
+        writer.writerow(header + extra)
+        for row in rows[1:]:
+            writer.writerow(row + [f'unused value {k}' for k in range(len(extra))])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark loading sessions.csv.')
+    parser.add_argument('-c', '--csv', default='CSV/sessions.csv')
+    parser.add_argument('-p', '--pad', type=int, default=0,
+                        help='unused columns added per contribution')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('--measure', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = args.csv
+        if args.pad:
+            fname = os.path.join(tmp, 'sessions.csv')
+            pad(args.csv, args.pad, fname)
+        print(f'{fname}: {os.path.getsize(fname) / 2**20:.1f} MB')
+        baseline = min(run('import only', fname)[1] for _ in range(args.repeat))
+        for variant in variants:
+            try:
+                results = [run(variant, fname) for _ in range(args.repeat)]
+            except subprocess.CalledProcessError:
+                print(f'{variant:>16}: failed (is pyarrow installed?)')
+                continue
+            elapsed = min(result[0] for result in results)
+            memory = (min(result[1] for result in results) - baseline) / 1024
+            print(f'{variant:>16}: {elapsed:.3f}s, {memory:.1f} MB peak, '
+                  f'{results[0][3] / 2**20:.1f} MB frame, {int(results[0][2])} columns')
+
+if __name__ == "__main__":
+    main()
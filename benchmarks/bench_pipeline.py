@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Time the stages of the generator on synthetic conferences (see
+# synth_conference.py) of the given scales. Every run happens in a fresh
+# interpreter working in a temporary copy of the LaTeX folder, with a cold
+# abstract cache. Per stage it reports wall and CPU time of the process and
+# the peak resident set size reached by the end of the stage (the high-water
+# mark, so a stage only shows its own peak if it exceeds the earlier ones).
+# --save writes the results as JSON, --compare prints the change against such
+# a file, e.g. one saved before a change to the generator.
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from synth_conference import make_conference, write_csv
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+stages = ['load', 'contributions', 'model', 'boa', 'dsp', 'rooms']
+
+# child process: run the stages in `tree` and write their measurements to `out`
+def measure(tree, out, jobs):
+    sys.path.insert(0, root)
+    os.chdir(tree)
+    import BoA_DSP_generator as generator
+    from schedule import build_conference
+
+    results = {}
+    def stage(name, function, *args, **kwargs):
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = function(*args, **kwargs)
+        results[name] = {'wall': time.perf_counter() - wall,
+                         'cpu': time.process_time() - cpu,
+                         'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+        return result
+
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            df, organizers = stage('load', lambda: (generator.load_sessions('./CSV/sessions.csv'),
+                                                    generator.load_organizers('./CSV/organizers.csv')))
+            contributions = stage('contributions', generator.get_contributions, df)
+            conference = stage('model', build_conference, df, organizers, contributions)
+            stage('boa', generator.make_boa, conference, jobs=jobs)
+            stage('dsp', generator.make_dsp, conference)
+            stage('rooms', generator.make_room_plans, conference, jobs=jobs)
+        finally:
+            sys.stdout = stdout
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(results, f)
+
+# a scratch tree with the static LaTeX files and the synthetic exports
+def prepare(tmp, scale, seed):
+    tree = os.path.join(tmp, f'scale{scale}')
+    shutil.copytree(os.path.join(root, 'LaTeX'), os.path.join(tree, 'LaTeX'),
+                    ignore=shutil.ignore_patterns('*.pdf', '*.aux', '*.log', '*.fmt', 'parts'))
+    start = time.perf_counter()
+    conference = make_conference(scale, seed)
+    write_csv(conference, os.path.join(tree, 'CSV'))
+    size = os.path.getsize(os.path.join(tree, 'CSV', 'sessions.csv')) / 2**20
+    print(f'scale {scale}: {len(conference.sessions)} sessions, {size:.1f} MB sessions.csv '
+          f'(synthesized in {time.perf_counter() - start:.1f}s)')
+    return tree
+
+def run(tree, jobs):
+    out = os.path.join(tree, 'stages.json')
+    subprocess.check_call([sys.executable, __file__, '--measure', tree, out, '--jobs', str(jobs)])
+    with open(out, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def report(results, baseline=None):
+    header = f'{"stage":>14}  {"wall":>8}  {"cpu":>8}  {"peak RSS":>9}'
+    print(header + ('  wall vs. baseline' if baseline else ''))
+    for name in stages + ['total']:
+        if name == 'total':
+            result = {'wall': sum(results[s]['wall'] for s in stages),
+                      'cpu': sum(results[s]['cpu'] for s in stages),
+                      'rss': max(results[s]['rss'] for s in stages)}
+        else:
+            result = results[name]
+        line = f'{name:>14}  {result["wall"]:7.3f}s  {result["cpu"]:7.3f}s  {result["rss"]:6.0f} MB'
+        if baseline:
+            before = (sum(baseline[s]['wall'] for s in stages) if name == 'total'
+                      else baseline[name]['wall'])
+            line += f'  {result["wall"] / before - 1:+8.1%}'
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the generator stages on synthetic conferences.')
+    parser.add_argument('-s', '--scale', type=int, nargs='+', default=[1, 10],
+                        help='multiples of a normal GAMM meeting (default: 1 10)')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='worker processes of the generator')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', metavar='FILE', help='write the results as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='compare with results saved by --save')
+    parser.add_argument('--measure', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure, args.jobs)
+        return
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scale:
+            tree = prepare(tmp, scale, args.seed)
+            runs = [run(tree, args.jobs) for _ in range(args.repeat)]
+            # the fastest run per stage, memory is the same in every run
+            results[str(scale)] = {name: {'wall': min(r[name]['wall'] for r in runs),
+                                          'cpu': min(r[name]['cpu'] for r in runs),
+                                          'rss': max(r[name]['rss'] for r in runs)}
+                                   for name in stages}
+            report(results[str(scale)], baseline.get(str(scale)))
+            print()
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+if __name__ == "__main__":
+    main()
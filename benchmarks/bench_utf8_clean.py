@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Check that the single-pass utf8_clean gives exactly the output of the ordered
+# replacements on every text field of sessions.csv, then time both on a
+# multi-megabyte corpus built from the abstracts.
+
+import argparse
+import os
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from BoA_DSP_generator import utf8_clean, utf8_clean_ordered
+from html2latex import html2latex
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify and benchmark utf8_clean.')
+    parser.add_argument('-c', '--csv', default='CSV/sessions.csv')
+    parser.add_argument('-s', '--size', type=float, default=4.0, help='corpus size in MB')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, sep=';', quotechar='"', dtype=str)
+    # the generator cleans the LaTeX produced from the abstracts
+    abstracts = [html2latex(value) for col in df.columns if col.endswith('_abstract')
+                 for value in df[col].dropna()]
+    texts = [value for col in df.columns for value in df[col].dropna()] + abstracts
+
+    mismatches = [text for text in texts if utf8_clean(text) != utf8_clean_ordered(text)]
+    print(f'{len(texts)} fields compared, {len(mismatches)} mismatches')
+    for text in mismatches[:5]:
+        print(f'  {text[:100]!r}')
+
+    abstracts = '\n'.join(abstracts)
+    corpus = abstracts * max(1, int(args.size * 2**20 / max(1, len(abstracts.encode()))))
+    print(f'corpus: {len(corpus.encode()) / 2**20:.1f} MB')
+    for name, fun in [('ordered', utf8_clean_ordered), ('single pass', utf8_clean)]:
+        best = min(timeit.repeat(lambda: fun(corpus), number=1, repeat=args.repeat))
+        print(f'{name:>12}: {best:.3f}s')
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
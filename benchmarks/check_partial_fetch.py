@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Regression check for RunMe.py --watch: a new sessions.csv that arrives in
+# the same poll as a failing export must still be regenerated and compiled.
+# fetch_all saves the manifest of the exports that did arrive before it
+# raises, so the next poll sees no change and the new schedule would be lost
+# unless watch() takes the changed exports from the ExportError.
+#
+# A scratch tree with a synthetic conference is served by fake_conftool.py.
+# RunMe.py watches it for two polls; between them the session title of one
+# session changes and the speakers export turns into an error page. No TeX is
+# needed, compile_documents only records its calls. Exits with status 1 if
+# the second poll does not compile.
+
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+from fake_conftool import serve
+from synth_conference import make_conference, write_csv
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+def change_title(datadir, row=0):
+    fname = os.path.join(datadir, 'sessions.csv')
+    with open(fname, 'r', newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f, delimiter=';', quotechar='"'))
+    rows[row]['session_title'] += ' (moved)'
+    with open(fname, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, list(rows[0]), delimiter=';', quotechar='"', quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows[row]['session_short']
+
+def break_export(datadir, fname='speakers.csv'):
+    with open(os.path.join(datadir, fname), 'w', encoding='utf-8') as f:
+        f.write('<html><body>Internal Server Error</body></html>\n')
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that --watch keeps changes that arrive with a failing export.')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    secret = 'check-secret'
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = os.path.join(tmp, 'tree')
+        datadir = os.path.join(tmp, 'served')
+        shutil.copytree(os.path.join(root, 'LaTeX'), os.path.join(tree, 'LaTeX'),
+                        ignore=shutil.ignore_patterns('*.pdf', '*.aux', '*.log', '*.fmt', 'parts'))
+        write_csv(make_conference(1, args.seed), datadir)
+        server = serve(datadir, secret)
+        with open(os.path.join(tree, '.url'), 'w') as f:
+            f.write(server.url)
+        with open(os.path.join(tree, '.secret'), 'w') as f:
+            f.write(secret)
+
+        cwd = os.getcwd()
+        os.chdir(tree)
+        try:
+            import RunMe
+            RunMe.fetcher.retries = 1
+            compiled = []
+            RunMe.compile_documents = lambda args, targets, room_files, force=False: compiled.append(room_files)
+
+            edited = []
+            def sleep(seconds):
+                edited.append(change_title(datadir))
+                break_export(datadir)
+            RunMe.time = types.SimpleNamespace(sleep=sleep, strftime=time.strftime)
+
+            argv = sys.argv
+            sys.argv = ['RunMe.py', '--watch', '1', '--polls', '2']
+            try:
+                RunMe.main()
+            finally:
+                sys.argv = argv
+        finally:
+            os.chdir(cwd)
+            server.shutdown()
+
+    print(f'\nChanged session {edited[0]} together with a failing speakers export, '
+          f'{len(compiled)} of 2 polls compiled')
+    if len(compiled) != 2:
+        print('The change of sessions.csv was dropped')
+        sys.exit(1)
+    print('OK')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# A minimal stand-in for the ConfTool Pro REST interface. It checks the
+# nonce/passhash authentication exactly like the real server (every nonce may
+# only be used once) and answers the adminExport requests of
+# get_conftool_data.py with CSV files from a local directory.
+
+import argparse
+import hashlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# which file answers which export request
+def export_file(params):
+    select = params.get('export_select', [''])[0]
+    match select:
+        case 'sessions':
+            return 'sessions.csv'
+        case 'reviewers':
+            return 'organizers.csv'
+        case 'subsumed_authors':
+            return 'speakers.csv'
+        case 'papers':
+            if 'session' in params.get('form_export_papers_options[]', []):
+                return 'contributions.csv'
+            return 'abstracts.csv'
+    return None
+
+class FakeConfTool(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, datadir, password, latency=0.0):
+        super().__init__(address, FakeConfToolHandler)
+        self.datadir = datadir
+        self.password = password
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.seen_nonces = set()
+        self.requests = 0
+        self.rejected = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/rest.php'
+
+    # returns an error message or None if the request authenticates
+    def check_auth(self, nonce, passhash):
+        expected = hashlib.sha256((nonce + self.password).encode()).hexdigest()
+        with self.lock:
+            self.requests += 1
+            if passhash != expected:
+                self.rejected += 1
+                return 'wrong passhash'
+            if nonce in self.seen_nonces:
+                self.rejected += 1
+                return f'nonce {nonce} has already been used'
+            self.seen_nonces.add(nonce)
+        return None
+
+class FakeConfToolHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        params = parse_qs(self.rfile.read(length).decode())
+        error = self.server.check_auth(params.get('nonce', [''])[0],
+                                       params.get('passhash', [''])[0])
+        if error is not None:
+            self.answer(403, f'<html><body>{error}</body></html>'.encode(), 'text/html')
+            return
+        fname = export_file(params)
+        if fname is None:
+            self.answer(400, b'<html><body>unknown export</body></html>', 'text/html')
+            return
+        time.sleep(self.server.latency)
+        path = os.path.join(self.server.datadir, fname)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                body = f.read()
+        else:
+            body = b'"id";"name"\n'
+        self.answer(200, body, 'text/csv; charset=utf-8')
+
+    def answer(self, code, body, content_type):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# start the server in a background thread, port 0 picks a free port
+def serve(datadir, password, port=0, latency=0.0):
+    server = FakeConfTool(('127.0.0.1', port), datadir, password, latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve CSV files through a fake ConfTool REST interface.')
+    parser.add_argument('datadir', help='directory holding sessions.csv, organizers.csv, ...')
+    parser.add_argument('-p', '--port', type=int, default=8080)
+    parser.add_argument('-s', '--secret', default='fake-secret', help='REST passphrase to accept')
+    parser.add_argument('-l', '--latency', type=float, default=0.0, help='seconds to wait before answering an export')
+    args = parser.parse_args()
+
+    server = FakeConfTool(('127.0.0.1', args.port), args.datadir, args.secret, args.latency)
+    print(f'Serving {args.datadir} at {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f'{server.requests} requests, {server.rejected} rejected')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Synthetic sessions.csv and organizers.csv in the layout of the ConfTool
+# exports, for measuring the generator without a real (and unshareable)
+# export. At scale 1 the schedule resembles a GAMM annual meeting: five days
+# with the Prandtl memorial lecture, a plenary lecture per day, the von Mises
+# prize lecture, a poster session and 16 parallel tracks of minisymposia
+# (30 minute talks), young researchers minisymposia, DFG programs and
+# contributed sessions (20 minute talks, some 40 minute topical talks and
+# some with an empty first slot), about 900 contributions in total. The
+# parallel tracks and with them the number of minisymposia, DFG programs and
+# contributed sessions grow linearly with the scale. Abstracts are HTML using
+# the tags html2latex translates, with a mix of the Unicode characters
+# utf8_clean replaces. The output only depends on scale and seed.
+
+import argparse
+import csv
+import datetime as dt
+import os
+import random
+
+first_names = ['Anna', 'Ben', 'Clara', 'David', 'Eva', 'Felix', 'Greta', 'Hans',
+               'Ida', 'Jonas', 'Karla', 'Lukas', 'Mia', 'Noah', 'Olga', 'Paul']
+last_names = ['Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber', 'Meyer', 'Wagner', 'Becker',
+              'Schulz', 'Hoffmann', 'Koch', 'Richter', 'Klein', 'Wolf', 'Schröder', 'Neumann']
+organisations = ['TU Dresden', 'MPI Magdeburg', 'RWTH Aachen', 'TU München',
+                 'Uni Stuttgart', 'KIT Karlsruhe', 'ETH Zürich', 'TU Wien']
+words = ('model reduction finite element nonlinear dynamics stochastic optimal control fluid '
+         'flow contact mechanics multiscale homogenization tensor sparse solver adaptive mesh').split()
+snippets = ['<p>We consider the equation Δu = f in Ω with λ > 0 & ε small.</p>',
+            '<p style="text-align: justify;">The rate is 95% for μ = 1<sup>2</sup> and x<sub>i</sub>.</p>',
+            '<p>Results:<br />first <em>line</em> and <strong>bold</strong> #1.</p>',
+            '<ul><li>item one</li><li>item two ∈ Ω</li></ul>',
+            '<ol><li>first</li><li>second → third</li></ol>',
+            '<blockquote>quoted m^2 text</blockquote>',
+            '<p>Energy E = mc^2 with ω, π, ξ and ∞ and ≤ bound.</p>']
+
+# the contributed sections the book of abstracts expects
+sections = [f'S{i:02}' for i in range(1, 27) if i != 6] + ['S06.1', 'S06.2']
+
+max_contributions = 16
+time_format = '%Y-%m-%d %H:%M'
+
+class Conference:
+    def __init__(self, scale=1, seed=42):
+        self.random = random.Random(seed)
+        self.scale = scale
+        self.sessions = []
+        self.organizers = []
+
+    def person(self):
+        return f'{self.random.choice(first_names)} {self.random.choice(last_names)}'
+
+    def title(self):
+        return ' '.join(self.random.choice(words) for _ in range(self.random.randint(4, 10))).capitalize()
+
+    def abstract(self):
+        return ''.join(self.random.choice(snippets) + ' '
+                       + ' '.join(self.random.choice(words) for _ in range(40))
+                       for _ in range(self.random.randint(1, 3)))
+
+    def organizer(self, track_type):
+        self.organizers.append({'track_type': track_type,
+                                'name': self.random.choice(last_names),
+                                'firstname': self.random.choice(first_names),
+                                'organisation': self.random.choice(organisations)})
+
+    # a session with one contribution per (start, end) in `talks`
+    def session(self, short, title, room, start, end, talks):
+        row = {'session_short': short, 'session_title': title, 'session_room': room,
+               'session_start': start.strftime(time_format), 'session_end': end.strftime(time_format)}
+        chairs = self.random.randint(0, 3)
+        for c in range(1, 4):
+            row[f'chair{c}'] = self.person() if c <= chairs else ''
+        for i, (talk_start, talk_end) in enumerate(talks, 1):
+            authors = [self.person() for _ in range(self.random.randint(1, 3))]
+            row[f'p{i}_title'] = self.title()
+            row[f'p{i}_authors'] = ', '.join(authors)
+            row[f'p{i}_organisations'] = '; '.join(self.random.sample(organisations, self.random.randint(1, 2)))
+            row[f'p{i}_presenting_author'] = self.random.choice(authors)
+            row[f'p{i}_abstract'] = self.abstract()
+            row[f'p{i}_start'] = talk_start.strftime(time_format)
+            row[f'p{i}_end'] = talk_end.strftime(time_format)
+        self.sessions.append(row)
+
+def slots(start, minutes):
+    talks = []
+    for length in minutes:
+        talks.append((start, start + dt.timedelta(minutes=length)))
+        start += dt.timedelta(minutes=length)
+    return talks
+
+def at(day, hour, minute):
+    return dt.datetime(day.year, day.month, day.day, hour, minute)
+
+def make_conference(scale=1, seed=42):
+    conference = Conference(scale, seed)
+    session = conference.session
+    rng = conference.random
+    hour = dt.timedelta(hours=1)
+    days = [dt.date(2024, 3, 18) + dt.timedelta(days=d) for d in range(5)]
+    counts = {section: 0 for section in sections}
+    minis = young = dfg = 0
+    for d, day in enumerate(days):
+        # plenary lectures
+        if d == 0:
+            start = at(day, 9, 0)
+            session('PML', 'Prandtl Memorial Lecture', 'Audimax', start, start + hour, slots(start, [60]))
+        start = at(day, 8, 30) if d else at(day, 10, 15)
+        session(f'PL{d + 1:02}', f'Plenary Lecture {d + 1}', 'Audimax', start, start + hour, slots(start, [60]))
+        if d == 1:
+            start = at(day, 11, 0)
+            session('RvML', 'Richard von Mises Prize Lecture', 'Audimax', start, start + hour,
+                    slots(start, [30, 30]))
+        if d == 2:
+            start = at(day, 17, 40)
+            session('Poster', 'Poster Session', 'Foyer', start, start + hour + dt.timedelta(minutes=20),
+                    [(start, start)] * rng.randint(8, max_contributions))
+        # parallel tracks
+        blocks = [(13, 30, 120), (16, 0, 60)] + ([(17, 10, 60)] if d != 2 else [])
+        for hh, mm, length in blocks:
+            start = at(day, hh, mm)
+            end = start + dt.timedelta(minutes=length)
+            for k in range(16 * scale):
+                room = f'HSZ/{k:02}'
+                if length == 120 and k < 2 * scale and minis < 9 * scale:
+                    minis += 1
+                    session(f'MS{minis}', conference.title(), room, start, end, slots(start, [30] * 4))
+                elif length == 120 and 2 * scale <= k < 3 * scale and young < 3 * scale:
+                    young += 1
+                    session(f'YRM{young}', conference.title(), room, start, end, slots(start, [20] * 6))
+                elif length == 120 and 3 * scale <= k < 4 * scale and d < 2:
+                    dfg += 1
+                    program = f'DFG-PP{2297 + dfg}' if dfg % 2 else f'DFG-GRK{2582 + dfg}'
+                    session(program, conference.title(), room, start, end, slots(start, [20] * 6))
+                else:
+                    section = sections[(d * 7 + k + hh) % len(sections)]
+                    counts[section] += 1
+                    n = length // 20
+                    kind = rng.random()
+                    if kind < 0.2:   # topical speaker with a double slot
+                        talks = slots(start, [40] + [20] * (n - 2))
+                    elif kind < 0.3: # first slot left empty
+                        talks = slots(start + dt.timedelta(minutes=20), [20] * (n - 1))
+                    else:
+                        talks = slots(start, [20] * n)
+                    session(f'{section}.{counts[section]:02}', conference.title(), room, start, end, talks)
+
+    # section organizers, track types start with the section name
+    for section in sections:
+        for _ in range(rng.randint(1, 2)):
+            conference.organizer(f'{section} {conference.title()}')
+    for i in range(1, minis + 1):
+        conference.organizer(f'MS{i} {conference.title()}')
+    for i in range(1, young + 1):
+        conference.organizer(f'YRM{i} {conference.title()}')
+    for i in range(1, dfg + 1):
+        program = f'SPP{2297 + i}' if i % 2 else f'GRK{2582 + i}'
+        conference.organizer(f'{program} {conference.title()}')
+    # participants without a track
+    for _ in range(50 * scale):
+        conference.organizer('')
+    return conference
+
+def write_csv(conference, outdir):
+    columns = ['session_short', 'session_title', 'session_room', 'session_start', 'session_end',
+               'chair1', 'chair2', 'chair3']
+    for i in range(1, max_contributions + 1):
+        columns += [f'p{i}_{field}' for field in
+                    ['title', 'authors', 'organisations', 'presenting_author', 'abstract', 'start', 'end']]
+    # ConfTool exports more columns than the generator reads
+    columns += ['session_info', 'session_type']
+    os.makedirs(outdir, exist_ok=True)
+    with open(os.path.join(outdir, 'sessions.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, columns, delimiter=';', quotechar='"', quoting=csv.QUOTE_ALL, restval='')
+        writer.writeheader()
+        writer.writerows(conference.sessions)
+    with open(os.path.join(outdir, 'organizers.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, ['id', 'name', 'firstname', 'organisation', 'track_type'],
+                                delimiter=';', quotechar='"', quoting=csv.QUOTE_ALL, restval='')
+        writer.writeheader()
+        writer.writerows(conference.organizers)
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic sessions.csv and organizers.csv.')
+    parser.add_argument('outdir', nargs='?', default='CSV')
+    parser.add_argument('-s', '--scale', type=int, default=1, help='multiple of a normal GAMM meeting')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    conference = make_conference(args.scale, args.seed)
+    write_csv(conference, args.outdir)
+    contributions = sum(1 for row in conference.sessions for key in row if key.endswith('_title')
+                        and key.startswith('p'))
+    print(f'{args.outdir}: {len(conference.sessions)} sessions, {contributions} contributions, '
+          f'{len(conference.organizers)} organizers')
+
+if __name__ == "__main__":
+    main()
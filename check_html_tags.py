@@ -3,56 +3,202 @@
 # Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
 # License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
 
-import pandas as pd
+# Pre-flight check of the exports: every field of sessions.csv and
+# organizers.csv the generators print is turned into the LaTeX fragment they
+# write (abstracts through html2latex and utf8_clean, all other fields through
+# utf8_clean) and checked for what would stop pdflatex: characters utf8_clean
+# does not map and inputenc cannot typeset, unescaped & _ ^ # % and unbalanced
+# $ outside math, unbalanced braces, \begin/\end pairs that do not match and a
+# trailing backslash escaping the closing brace of the macro argument. All
+# fragments go through the checks together as one column of strings, so a
+# full export takes a fraction of a second. Every problem is reported with
+# the session_short and the number of the contribution, and the script exits
+# with status 1 if there are any. RunMe.py runs the same checks before
+# generating and compiling.
+
 import re
-from html2latex import html2latex 
+import argparse
+import pandas as pd
 
-def print_tags(instr):
-    # Regular expression to match HTML tags
-    tag_regex = re.compile('<[a-zA-Z/]{1}[^><]+>')
+import BoA_DSP_generator as generator
+from html2latex import HTML2LaTeX
 
-    # Use a set to collect unique tags
-    unique_tags = set()
+################################################################################
+# What pdflatex (inputenc utf8, T1 fonts) can typeset without further setup:  #
+# printable ASCII, Latin-1, Latin Extended-A and the usual punctuation.       #
+# Anything else must be mapped by utf8_to_latex in BoA_DSP_generator.py.      #
+################################################################################
+latex_ready = ('\u00a0-\u017f\u2013\u2014\u2018\u2019\u201a\u201c\u201d\u201e'
+               '\u2020\u2021\u2022\u2026\u2030\u2039\u203a\u20ac')
+unmapped = re.compile(f'[^\t\n\r\x20-\x7e{latex_ready}]')
 
-    tags = tag_regex.findall(instr)
-    for tag in tags:
-        unique_tags.add(tag)
+# escaped characters and control symbols, but not \( \) \[ \] which open and
+# close math; \\ is consumed as a pair, so "\\&" still leaves a stray &
+escaped = r'\\[^a-zA-Z()\[\]]'
+math = (r'\$\$.*?\$\$|\$.*?\$|\\\(.*?\\\)|\\\[.*?\\\]'
+        r'|\\begin\{(?P<env>equation|align|alignat|gather|multline|eqnarray)(\*?)\}.*?\\end\{(?P=env)\2\}')
+stray = re.compile(r'[&_^#%]')
+group = r'\{[^{}]*\}'
+environment = re.compile(r'\\(begin|end)\s*\{([^{}]*)\}')
 
-    # Print each unique tag
-    for tag in unique_tags:
-        print(tag)
+################################################################################
+# The fragments to check, one row per field with its location                 #
+################################################################################
+def fragments(df, organizers, contributions):
+    frames = []
+    for field in ['session_title', 'session_room', 'chair1', 'chair2', 'chair3']:
+        frames.append(pd.DataFrame({'session_short': df['session_short'], 'idx': 0,
+                                    'field': field, 'text': df[field]}))
+    for field in ['title', 'authors', 'presenter', 'organizations', 'abstract']:
+        frames.append(pd.DataFrame({'session_short': contributions['session_short'],
+                                    'idx': contributions['idx'], 'field': field,
+                                    'text': contributions[field]}))
+    for field in ['track_type', 'firstname', 'name', 'organisation']:
+        frames.append(pd.DataFrame({'session_short': 'organizers.csv ' + organizers['track_type'].astype(str),
+                                    'idx': 0, 'field': field, 'text': organizers[field]}))
+    found = pd.concat(frames, ignore_index=True)
+    found = found[found['text'].notna()].reset_index(drop=True)
+    found['text'] = found['text'].astype(str)
+    # abstracts are converted and cleaned already, the writers clean the rest
+    plain = found['field'] != 'abstract'
+    found.loc[plain, 'text'] = found.loc[plain, 'text'].map(generator.utf8_clean)
+    return found
+
+def context(text, start, end, width=25):
+    before = text[max(start - width, 0):start]
+    after = text[end:end + width]
+    return f'"{before}>>{text[start:end]}<<{after}"'.replace('\n', ' ')
+
+def code_points(chars):
+    return ', '.join(f'{c} (U+{ord(c):04X})' if c.isprintable() else f'U+{ord(c):04X}'
+                     for c in dict.fromkeys(chars))
+
+# removes innermost {...} groups until nothing changes, what is left of any
+# brace is unbalanced
+def unbalanced_braces(text):
+    text = text.str.replace(r'[^{}]+', '', regex=True)
+    while True:
+        reduced = text.str.replace(group, '', regex=True)
+        if reduced.equals(text):
+            return reduced != ''
+        text = reduced
+
+def environment_problem(text):
+    stack = []
+    for kind, name in environment.findall(text):
+        if kind == 'begin':
+            stack.append(name)
+        elif not stack:
+            return f'\\end{{{name}}} without \\begin{{{name}}}'
+        elif stack[-1] != name:
+            return f'\\begin{{{stack[-1]}}} ended by \\end{{{name}}}'
+        else:
+            stack.pop()
+    if stack:
+        return f'\\begin{{{stack[-1]}}} is never ended'
+    return None
+
+################################################################################
+# Runs all checks on the fragments and returns a frame with one row per      #
+# problem (session_short, idx, field, problem)                               #
+################################################################################
+def lint_fragments(found):
+    text = found['text']
+    problems = []
+    def add(mask, messages):
+        problems.append(pd.DataFrame({'session_short': found.loc[mask, 'session_short'],
+                                      'idx': found.loc[mask, 'idx'],
+                                      'field': found.loc[mask, 'field'],
+                                      'problem': messages}))
 
-# Step 1: Quickly scan the CSV for column names
-with open('./CSV/sessions.csv', 'r', encoding='utf-8') as file:
-    first_line = file.readline()
-    all_columns = first_line.strip().split(';')
+    mask = text.str.contains(unmapped.pattern, regex=True)
+    add(mask, [f'unmapped character(s) {code_points(chars)}' for chars in text[mask].map(unmapped.findall)])
 
-# Filter column names containing 'abstract'
-abstract_columns = [col.replace('"', '') for col in all_columns if 'abstract' in col]
+    bare = text.str.replace(escaped, '  ', regex=True)
+    dollars = bare.str.count(r'\$')
+    mask = dollars % 2 == 1
+    add(mask, ['unbalanced $'] * int(mask.sum()))
 
-# Step 2: Read the CSV with selected columns
-df = pd.read_csv('./CSV/sessions.csv',  sep=';', quotechar='"', usecols=abstract_columns)
+    # same length as the text, so positions point into the fragment
+    outside = bare.copy()
+    mask = bare.str.contains(r'\$|\\[(\[]|\\begin', regex=True)
+    outside[mask] = bare[mask].str.replace(math, lambda m: ' ' * len(m.group(0)), regex=True, flags=re.DOTALL)
+    mask = (dollars % 2 == 0) & outside.str.contains(stray)
+    add(mask, [f'{match.group(0)} outside math mode in {context(t, match.start(), match.end())}'
+               for t, match in zip(text[mask], outside[mask].map(stray.search))])
 
-# Now df contains only the columns whose names contain 'abstract'
-# You can proceed to concatenate their contents and write to a file as needed
+    mask = text.str.contains(r'[{}]') & unbalanced_braces(bare)
+    add(mask, ['unbalanced braces'] * int(mask.sum()))
 
-# Step 3: Concatenate all row contents from the 'abstract' columns
-# Adjust the separator if needed, here it's assumed to be a space
-all_abstracts = df.apply(lambda x: ' '.join(x.dropna().astype(str)), axis=1).str.cat(sep='\n\n')
+    mask = text.str.contains(r'\\(?:begin|end)', regex=True)
+    messages = text[mask].map(environment_problem).dropna()
+    add(messages.index, messages)
+
+    # an odd number of backslashes at the end
+    stripped = text.str.rstrip()
+    mask = (stripped.str.len() - stripped.str.rstrip('\\').str.len()) % 2 == 1
+    add(mask, ['ends in a backslash, which escapes the closing brace'] * int(mask.sum()))
+
+    return pd.concat(problems).sort_values(['session_short', 'idx'], kind='stable')
+
+def lint(df, organizers, contributions):
+    return lint_fragments(fragments(df, organizers, contributions))
+
+def location(problem):
+    where = problem.session_short
+    if problem.idx:
+        where += f' #{problem.idx}'
+    return f'{where} {problem.field}'
+
+def report(problems):
+    for problem in problems.itertuples():
+        print(f'{location(problem)}: {problem.problem}')
+    if len(problems):
+        print(f'\n{len(problems)} problem(s) that would stop pdflatex')
+
+################################################################################
+# With --tags all abstracts are also written to all_abstracts.html and, after #
+# conversion, all_abstracts.tex, and the HTML tags used in them are listed,   #
+# to check that all of them are covered by html2latex.py                      #
+################################################################################
+tag_regex = re.compile('<[a-zA-Z/]{1}[^><]+>')
+
+def print_tags(instr):
+    for tag in set(tag_regex.findall(instr)):
+        print(tag)
 
-# Step 4: Write the concatenated string to a UTF-8 encoded file
-with open('all_abstracts.html', 'w', encoding='utf-8') as file:
-    file.write(all_abstracts)
+def dump_abstracts(df):
+    columns = [col for col in df.columns if col.endswith('_abstract')]
+    all_abstracts = df[columns].apply(lambda x: ' '.join(x.dropna().astype(str)), axis=1).str.cat(sep='\n\n')
+    with open('all_abstracts.html', 'w', encoding='utf-8') as file:
+        file.write(all_abstracts)
+    print_tags(all_abstracts)
 
+    # the converter reports unhandled tags and nesting problems on the way
+    print('\nRemaining tags\n')
+    converter = HTML2LaTeX(report=print)
+    with open('all_abstracts.tex', 'w', encoding='utf-8') as file:
+        file.write(converter.convert(all_abstracts))
 
-# Step 5: find all html tags in all_abstracts and write them to the screen
-print_tags(all_abstracts)
+def main():
+    parser = argparse.ArgumentParser(description='Check the exports for fields that would stop pdflatex.')
+    parser.add_argument('--sessions', default='CSV/sessions.csv')
+    parser.add_argument('--organizers', default='CSV/organizers.csv')
+    parser.add_argument('--tags', action='store_true',
+                        help='Also write all_abstracts.html and all_abstracts.tex and list the HTML tags used.')
+    args = parser.parse_args()
 
-# Step 6: replace all html tags by LaTeX equivalents
-all_abstracts = html2latex(all_abstracts)
-print('\nRemaining tags\n')
-print_tags(all_abstracts)
+    # the given files are read directly, the schedule cache in CSV/ belongs
+    # to the exports RunMe.py generates from
+    df, organizers, contributions = generator.load_schedule(args.sessions, args.organizers, use_cache=False)
+    if args.tags:
+        dump_abstracts(df)
+        print()
+    problems = lint(df, organizers, contributions)
+    report(problems)
+    if len(problems):
+        raise SystemExit(1)
+    print('No problems found')
 
-# Step 7: Write the LaTeX string to a UTF-8 encoded file
-with open('all_abstracts.tex', 'w', encoding='utf-8') as file:
-    file.write(all_abstracts)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Change-impact diff between two snapshots of the ConfTool exports (see
+# save_snapshot in get_conftool_data.py), or between a snapshot and the CSV
+# folder. Sessions are matched by session_short and contributions by
+# session_short and their index p<N> in the sessions export. A contribution
+# slot whose title and presenter both changed holds another talk now; such
+# talks are matched by title and presenter across all sessions and reported
+# as moved. Every change is mapped to the generated LaTeX files and the PDFs
+# built from them (using LaTeX/dependencies.json where it knows the file).
+#
+# Only the columns the generator reads are parsed, as strings, and all fields
+# are compared column by column, so diffing two full exports takes a fraction
+# of a second and can precede every rebuild.
+
+import io
+import os
+import re
+import csv
+import gzip
+import json
+import time
+import argparse
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa_csv = None
+
+import BoA_DSP_generator as generator
+import get_conftool_data as fetcher
+
+session_fields = {'session_title': 'title', 'session_room': 'room',
+                  'session_start': 'start', 'session_end': 'end'}
+talk_fields = ['title', 'authors', 'organisations', 'presenting_author', 'abstract', 'start', 'end']
+
+# the kinds of changes the daily program and the room plans print, all other
+# changes only affect the book of abstracts
+program_kinds = {'session added', 'session removed', 'room', 'time',
+                 'talk added', 'talk removed', 'moved', 'talk time', 'title', 'presenter'}
+
+boa_dir = 'LaTeX/Book_of_abstracts/'
+dsp_file = 'LaTeX/Daily_Scientific_Program/Daily_Scientific_Program.tex'
+rooms_dir = 'LaTeX/Daily_Scientific_Program/rooms/'
+
+################################################################################
+# Reading snapshots. A snapshot is an entry of CSV/snapshots/index.json, None #
+# stands for the current files in the CSV folder.                             #
+################################################################################
+def read_export(snapshot, export_name):
+    if snapshot is None:
+        with open(os.path.join(fetcher.output_dir, fetcher.files[export_name]), 'rb') as f:
+            return f.read()
+    if export_name not in snapshot['exports']:
+        raise SystemExit(f'the snapshot of {snapshot["time"]} has no {export_name} export')
+    with gzip.open(fetcher.snapshot_object(snapshot['exports'][export_name]), 'rb') as f:
+        return f.read()
+
+# `columns` of a semicolon separated export as strings, empty fields as ''.
+# With pyarrow the columns are read as Arrow strings, which is several times
+# faster than converting them to Python strings and compares as fast.
+def read_csv(data, columns):
+    if pa_csv is not None:
+        table = pa_csv.read_csv(io.BytesIO(data),
+                                parse_options=pa_csv.ParseOptions(delimiter=';', newlines_in_values=True),
+                                convert_options=pa_csv.ConvertOptions(
+                                    include_columns=columns, strings_can_be_null=False,
+                                    column_types={col: pa.string() for col in columns}))
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return pd.read_csv(io.BytesIO(data), sep=';', quotechar='"', usecols=columns,
+                       dtype={col: 'str' for col in columns}, engine='c').fillna('')
+
+# the sessions indexed by session_short and their contributions indexed by
+# session_short and idx
+def read_sessions(data):
+    header = next(csv.reader([data.split(b'\n', 1)[0].decode('utf-8-sig')], delimiter=';', quotechar='"'))
+    columns = [col for col in header
+               if col in generator.session_columns or generator.contribution_column.fullmatch(col)]
+    df = read_csv(data, columns).drop_duplicates('session_short')
+    sessions = df[list(session_fields)].rename(columns=session_fields)
+    sessions['chairs'] = [', '.join(chair for chair in chairs if chair)
+                          for chairs in zip(df['chair1'], df['chair2'], df['chair3'])]
+    sessions.index = pd.Index(df['session_short'], name='session')
+
+    nmax = max([int(match.group(1)) for match in
+                (re.fullmatch(r'p(\d+)_presenting_author', col) for col in df.columns)
+                if match is not None] or [0])
+    frames = []
+    for idx in range(1, nmax + 1):
+        frame = pd.DataFrame({field: df[f'p{idx}_{field}'] if f'p{idx}_{field}' in df else ''
+                              for field in talk_fields})
+        frame.insert(0, 'idx', idx)
+        frame.insert(0, 'session', df['session_short'])
+        frames.append(frame)
+    if frames:
+        talks = pd.concat(frames, ignore_index=True)
+        talks = talks[talks['presenting_author'] != ''].set_index(['session', 'idx'])
+    else:
+        talks = pd.DataFrame(columns=talk_fields,
+                             index=pd.MultiIndex.from_tuples([], names=['session', 'idx']))
+    return sessions, talks
+
+# the organisation of every organizer by track type, first name and name
+def read_organizers(data):
+    organizers = read_csv(data, ['track_type', 'name', 'firstname', 'organisation'])
+    organizers = organizers[organizers['track_type'] != '']
+    return {(track_type, firstname, name): organisation for track_type, firstname, name, organisation
+            in zip(organizers['track_type'], organizers['firstname'], organizers['name'],
+                   organizers['organisation'])}
+
+def load(snapshot):
+    sessions, talks = read_sessions(read_export(snapshot, 'sessions'))
+    return SimpleNamespace(sessions=sessions, talks=talks,
+                           organizers=read_organizers(read_export(snapshot, 'organizers')),
+                           index=generator.PrefixIndex([SimpleNamespace(number=number)
+                                                        for number in sessions.index], 'number'))
+
+################################################################################
+# The diff. Every change is a dict with its kind, the session(s) and         #
+# contribution it concerns, the old and new value and the rooms the session  #
+# was and is in.                                                             #
+################################################################################
+def change(kind, session, idx=None, old='', new='', rooms=(), moved_to=None):
+    return {'kind': kind, 'session': session, 'idx': idx, 'old': old, 'new': new,
+            'rooms': sorted({room for room in rooms if room}), 'moved_to': moved_to}
+
+def room(snapshot, session):
+    return snapshot.sessions['room'].get(session, '')
+
+# the room of a session before and after
+def rooms(old, new, session):
+    return room(old, session), room(new, session)
+
+# rows of two frames indexed alike whose `fields` differ
+def differing(old, new, fields):
+    mask = np.zeros(len(old), dtype=bool)
+    for field in fields:
+        mask |= np.asarray(old[field].array != new[field].array, dtype=bool)
+    return old.index[mask]
+
+def diff_sessions(old, new):
+    changes = []
+    for s in old.sessions.index.difference(new.sessions.index, sort=False):
+        changes.append(change('session removed', s, rooms=rooms(old, new, s)))
+    for s in new.sessions.index.difference(old.sessions.index, sort=False):
+        changes.append(change('session added', s, rooms=rooms(old, new, s)))
+    common = old.sessions.index.intersection(new.sessions.index, sort=False)
+    o, n = old.sessions.loc[common], new.sessions.loc[common]
+    for s in differing(o, n, ['room']):
+        changes.append(change('room', s, old=o.at[s, 'room'], new=n.at[s, 'room'], rooms=rooms(old, new, s)))
+    for s in differing(o, n, ['start', 'end']):
+        changes.append(change('time', s, old=f'{o.at[s, "start"]} - {o.at[s, "end"]}',
+                              new=f'{n.at[s, "start"]} - {n.at[s, "end"]}', rooms=rooms(old, new, s)))
+    for field, kind in [('chairs', 'chairs'), ('title', 'session title')]:
+        for s in differing(o, n, [field]):
+            changes.append(change(kind, s, old=o.at[s, field], new=n.at[s, field], rooms=rooms(old, new, s)))
+    return changes
+
+def diff_talks(old, new):
+    changes = []
+    common = old.talks.index.intersection(new.talks.index, sort=False)
+    o, n = old.talks.loc[common], new.talks.loc[common]
+    # a slot with another title and presenter holds another talk
+    replaced = o.index.intersection(differing(o, n, ['title']), sort=False).intersection(
+        differing(o, n, ['presenting_author']), sort=False)
+    removed = old.talks.index.difference(new.talks.index, sort=False).append(replaced)
+    added = new.talks.index.difference(old.talks.index, sort=False).append(replaced)
+
+    # talks that were removed in one place and added in another moved
+    origins = {}
+    for key, title, presenter in zip(removed, old.talks.loc[removed, 'title'],
+                                     old.talks.loc[removed, 'presenting_author']):
+        origins.setdefault((title, presenter), []).append(key)
+    arrived = set()
+    for key, title, presenter in zip(added, new.talks.loc[added, 'title'],
+                                     new.talks.loc[added, 'presenting_author']):
+        if origins.get((title, presenter)):
+            source = origins[(title, presenter)].pop(0)
+            arrived.add(source)
+            changes.append(change('moved', source[0], source[1], old=title, new=title,
+                                  rooms=(room(old, source[0]), room(new, key[0])), moved_to=list(key)))
+        # the talks of added and removed sessions are not listed one by one
+        elif key[0] in old.sessions.index:
+            changes.append(change('talk added', key[0], key[1], new=title,
+                                  rooms=rooms(old, new, key[0])))
+    for key, title in zip(removed, old.talks.loc[removed, 'title']):
+        if key not in arrived and key[0] in new.sessions.index:
+            changes.append(change('talk removed', key[0], key[1], old=title,
+                                  rooms=rooms(old, new, key[0])))
+
+    same = o.index.difference(replaced, sort=False)
+    o, n = o.loc[same], n.loc[same]
+    for fields, kind in [(['title'], 'title'), (['presenting_author'], 'presenter'),
+                         (['authors'], 'authors'), (['organisations'], 'organisations'),
+                         (['abstract'], 'abstract'), (['start', 'end'], 'talk time')]:
+        for key in differing(o, n, fields):
+            old_value = ' - '.join(o.loc[key, fields]) if kind == 'talk time' else o.at[key, fields[0]]
+            new_value = ' - '.join(n.loc[key, fields]) if kind == 'talk time' else n.at[key, fields[0]]
+            changes.append(change(kind, key[0], key[1], old=old_value, new=new_value,
+                                  rooms=rooms(old, new, key[0])))
+    return changes
+
+def diff_organizers(old, new):
+    changes = []
+    for key in sorted(old.organizers.keys() | new.organizers.keys()):
+        track_type, firstname, name = key
+        before, after = old.organizers.get(key), new.organizers.get(key)
+        if before != after:
+            changes.append(change('organizer', track_type,
+                                  old='' if before is None else f'{firstname} {name} ({before})',
+                                  new='' if after is None else f'{firstname} {name} ({after})'))
+    return changes
+
+################################################################################
+# Impact of the changes: the generated files they touch (as in                #
+# BoA_DSP_generator.py) and the PDFs built from these files.                  #
+################################################################################
+def boa_part(number):
+    for prefix, part in [('PML', 'plenary'), ('PL', 'plenary'), ('RvML', 'mises'),
+                         ('MS', 'minis'), ('YRM', 'minis'), ('DFG', 'dfg')]:
+        if number.startswith(prefix):
+            return part
+    return 'contributed'
+
+def affected_files(change, old, new):
+    files = set()
+    if change['kind'] == 'organizer':
+        organizers = generator.PrefixIndex([SimpleNamespace(track_type=change['session'])], 'track_type')
+        for sec, _ in generator.boa_sections(new.index):
+            if generator.section_organizers(organizers, sec):
+                files.add(f'{boa_dir}Sessions/{sec.replace(" ", "_")}.tex')
+        return files
+    sessions = [change['session']] + ([change['moved_to'][0]] if change['moved_to'] else [])
+    for number in sessions:
+        for snapshot in (old, new):
+            files.update(f'{boa_dir}Sessions/{fname}' for fname in generator.boa_files(number, snapshot.index))
+        if change['kind'] in ('session added', 'session removed'):
+            files.add(f'{boa_dir}Chapters/{boa_part(number)}.tex')
+    if change['kind'] in program_kinds:
+        files.add(dsp_file)
+        files.update(f'{rooms_dir}{generator.room_file_name(room)}.tex' for room in change['rooms'])
+    return files
+
+# maps every input file of the dependency graph to the documents (and parts of
+# the book of abstracts) built from it
+def load_graph():
+    try:
+        with open(generator.graph_file, 'r', encoding='utf-8') as f:
+            graph = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        graph = {}
+    users = {}
+    for name, entry in graph.items():
+        for fname in entry['inputs']:
+            users.setdefault(os.path.normpath(fname), set()).add(f'{name}.pdf')
+        for part, inputs in entry.get('parts', []):
+            for fname in inputs:
+                if not fname.endswith(('.cls', '.sty')) and os.path.basename(fname) != entry['texfile']:
+                    users.setdefault(os.path.normpath(fname), set()).add(f'{name}.pdf ({part})')
+    return users
+
+def affected_pdfs(files, users):
+    pdfs = set()
+    for fname in files:
+        if os.path.normpath(fname) in users:
+            pdfs |= users[os.path.normpath(fname)]
+        elif fname.startswith(boa_dir):
+            pdfs.add('BookOfAbstracts.pdf')
+        elif fname.startswith(rooms_dir):
+            pdfs.add(os.path.splitext(os.path.basename(fname))[0] + '.pdf')
+        else:
+            pdfs.add('Daily_Scientific_Program.pdf')
+    return pdfs
+
+# all changes from `old` to `new` (snapshots, None for the CSV folder), each
+# with the files and PDFs it affects
+def diff(old, new):
+    old, new = load(old), load(new)
+    changes = diff_sessions(old, new) + diff_talks(old, new) + diff_organizers(old, new)
+    users = load_graph()
+    for c in changes:
+        c['files'] = sorted(affected_files(c, old, new))
+        c['pdfs'] = sorted(affected_pdfs(c['files'], users))
+    return changes
+
+################################################################################
+# Reporting                                                                   #
+################################################################################
+def shorten(text, width=50):
+    text = ' '.join(str(text).split())
+    return text if len(text) <= width else text[:width - 3] + '...'
+
+def describe(c):
+    where = c['session'] + (f' #{c["idx"]}' if c['idx'] is not None else '')
+    match c['kind']:
+        case 'moved':
+            return f'{where:14} moved to {c["moved_to"][0]} #{c["moved_to"][1]}: {shorten(c["old"])}'
+        case 'talk added' | 'talk removed':
+            return f'{where:14} {c["kind"]}: {shorten(c["old"] or c["new"])}'
+        case 'session added' | 'session removed':
+            return f'{where:14} {c["kind"]}'
+        case 'abstract':
+            return f'{where:14} abstract changed'
+        case 'organizer':
+            return f'{shorten(where, 14):14} organizer: {c["old"] or "-"} -> {c["new"] or "-"}'
+    return f'{where:14} {c["kind"]}: {shorten(c["old"], 30)} -> {shorten(c["new"], 30)}'
+
+def report(changes, elapsed=None):
+    for c in changes:
+        print(describe(c))
+    files = sorted({fname for c in changes for fname in c['files']})
+    pdfs = sorted({pdf for c in changes for pdf in c['pdfs']})
+    if files:
+        print(f'\nAffected files ({len(files)}):')
+        for fname in files:
+            print(f'  {fname}')
+        print(f'Affected PDFs ({len(pdfs)}): {", ".join(pdfs)}')
+    timing = f' in {elapsed:.2f}s' if elapsed is not None else ''
+    print(f'{len(changes)} change(s){timing}')
+
+# `ref` is an index into the snapshot list (negative ones count from the
+# latest), the start of a snapshot time or "current" for the CSV folder.
+# Snapshot times start with the four digit year, so only numbers of at most
+# three digits are indices, longer ones ("2026", "20260317") are time prefixes
+def find_snapshot(ref, snapshots):
+    if ref == 'current':
+        return None
+    if re.fullmatch(r'-\d+|\d{1,3}', ref):
+        try:
+            return snapshots[int(ref)]
+        except IndexError:
+            raise SystemExit(f'there are only {len(snapshots)} snapshots')
+    matches = [snapshot for snapshot in snapshots if snapshot['time'].startswith(ref)]
+    if not matches:
+        raise SystemExit(f'no snapshot matches {ref}')
+    return matches[-1]
+
+# print the changes of the latest fetch, used by RunMe.py
+def report_latest():
+    snapshots = fetcher.load_snapshots()
+    if len(snapshots) < 2:
+        return
+    start = time.perf_counter()
+    changes = diff(snapshots[-2], snapshots[-1])
+    print(f'\nChanges since the snapshot of {snapshots[-2]["time"]}:')
+    report(changes, time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description='Show what changed between two snapshots of the ConfTool exports and which files and PDFs it affects.')
+    parser.add_argument('old', nargs='?', default='-2', help='snapshot number (up to three digits, negative counts from the latest), start of its time (e.g. 2026-03) or "current" (default: -2)')
+    parser.add_argument('new', nargs='?', default='-1', help='as OLD (default: -1, the latest)')
+    parser.add_argument('-l', '--list', action='store_true', help='list the snapshots')
+    parser.add_argument('--json', action='store_true', help='print the changes as JSON')
+    args = parser.parse_args()
+
+    snapshots = fetcher.load_snapshots()
+    if args.list:
+        for i, snapshot in enumerate(snapshots):
+            print(f'{i:4}  {snapshot["time"]}  ' + '  '.join(f'{name} {digest[:8]}'
+                                                           for name, digest in sorted(snapshot['exports'].items())))
+        return
+
+    old, new = find_snapshot(args.old, snapshots), find_snapshot(args.new, snapshots)
+    start = time.perf_counter()
+    changes = diff(old, new)
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps({'old': old and old['time'], 'new': new and new['time'],
+                          'seconds': round(elapsed, 3), 'changes': changes}, indent=2))
+    else:
+        report(changes, elapsed)
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,33 @@
 # Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
 # License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
 
+import argparse
+import csv
+import datetime as dt
+import gzip
 import hashlib
+import json
+import os
+import shutil
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-import os
+from requests.adapters import HTTPAdapter
+
+from profiling import profiler
 
 # configuration
-url = open('.url').read().strip()          # read URL from .url
-password = open('.secret').read().strip()  # read password from .secret
+url_file = ".url"                          # holds the URL of the REST interface
+secret_file = ".secret"                    # holds the REST passphrase
 output_dir = "./CSV"                       # where to put the CSVs
+manifest_file = os.path.join(output_dir, "manifest.json")  # content hashes of the last fetch
+snapshot_dir = os.path.join(output_dir, "snapshots")       # every fetched version, see save_snapshot
+timeout = (10, 300)   # seconds to wait for the connection and between two received chunks
+retries = 3           # attempts per export before giving up
+backoff = 2.0         # seconds to wait before the first retry, doubled for every further one
+chunk_size = 1 << 16  # bytes per streamed chunk
 
 # output file names for the different categories
 files = {
@@ -31,6 +49,16 @@ common_param = {
     "form_export_header": "default"             # we need the headers to locate the required columns
 }
 
+# columns that must appear in the header of an export before it may replace
+# the previous file. The generator relies on these, for the other exports we
+# only check that they are semicolon separated CSV.
+expected_columns = {
+    "sessions":   ["session_short", "session_title", "session_room",
+                   "session_start", "session_end",
+                   "chair1", "chair2", "chair3"],
+    "organizers": ["track_type", "name", "firstname", "organisation"],
+}
+
 # specific request parameters per output type
 exports = {
     "abstracts": {
@@ -66,37 +94,242 @@ exports = {
     }
 }
 
+# ConfTool refuses a nonce it has seen before. Instead of sleeping between the
+# requests, all nonces are drawn from a single allocator that hands out the
+# current time (in units of 0.1ms) and bumps it past the last value issued, so
+# concurrent requests never share a timestamp.
+class NonceAllocator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = 0
+
+    def next(self):
+        with self._lock:
+            self._last = max(int(time.time() * 10000), self._last + 1)
+            return self._last
+
+nonces = NonceAllocator()
+
+# read URL and passphrase of the ConfTool REST interface
+def read_config():
+    with open(url_file, 'r') as f:
+        url = f.read().strip()
+    with open(secret_file, 'r') as f:
+        password = f.read().strip()
+    return url, password
+
 # helper function generating a unique timestamp and password hash combination
 # for the REST auuthentication
-def generate_nonce_and_passhash():
+def generate_nonce_and_passhash(password):
  
-    timestamp = str(int(time.time() * 10000))
+    timestamp = str(nonces.next())
     passhash = hashlib.sha256((timestamp + password).encode()).hexdigest()
  
     return timestamp, passhash
 
+# the manifest maps every export to the SHA-256 of its last downloaded content
+def load_manifest():
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest):
+    with open(f'{manifest_file}.part', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f'{manifest_file}.part', manifest_file)
+
+# Every fetch that changed an export appends a snapshot, the hashes of all
+# exports at that time, to snapshots/index.json. The contents are stored once
+# per hash as snapshots/objects/<hash>.csv.gz, so an export that did not change
+# is not stored again. diff_snapshots.py compares two snapshots.
+def load_snapshots():
+    try:
+        with open(os.path.join(snapshot_dir, 'index.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+def snapshot_object(digest):
+    return os.path.join(snapshot_dir, 'objects', f'{digest}.csv.gz')
+
+def save_snapshot(manifest):
+    digests = {export_name: digest for export_name, digest in manifest.items()
+               if export_name in files and os.path.exists(os.path.join(output_dir, files[export_name]))}
+    snapshots = load_snapshots()
+    if not digests or (snapshots and snapshots[-1]['exports'] == digests):
+        return
+    os.makedirs(os.path.join(snapshot_dir, 'objects'), exist_ok=True)
+    for export_name, digest in digests.items():
+        fname = snapshot_object(digest)
+        if not os.path.exists(fname):
+            with open(os.path.join(output_dir, files[export_name]), 'rb') as src, \
+                 gzip.open(f'{fname}.part', 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(f'{fname}.part', fname)
+    snapshots.append({'time': dt.datetime.now().isoformat(timespec='seconds'), 'exports': digests})
+    index = os.path.join(snapshot_dir, 'index.json')
+    with open(f'{index}.part', 'w', encoding='utf-8') as f:
+        json.dump(snapshots, f, indent=2)
+    os.replace(f'{index}.part', index)
+
+# `changed` holds the exports that were fetched and changed although others
+# failed, their new files and manifest entries are already saved
+class ExportError(Exception):
+    def __init__(self, message, changed=()):
+        super().__init__(message)
+        self.changed = list(changed)
+
+# check the first line of a download before it may replace the previous file;
+# an error page or a comma separated export would otherwise silently break the
+# generator
+def validate_header(export_name, first_line):
+    try:
+        header = next(csv.reader([first_line.decode('utf-8-sig')], delimiter=';', quotechar='"'))
+    except (UnicodeDecodeError, StopIteration, csv.Error):
+        header = []
+    if len(header) < 2:
+        raise ExportError(f'{export_name}: response is not a semicolon separated CSV '
+                          f'(starts with {first_line[:60]!r})')
+    missing = [col for col in expected_columns.get(export_name, []) if col not in header]
+    if missing:
+        raise ExportError(f'{export_name}: missing columns {", ".join(missing)}')
+
+# stream one response into a temporary file next to the target, hashing and
+# validating on the way. Returns the path of the temporary file and the hash.
+def download(export_name, response, fname):
+    digest = hashlib.sha256()
+    first_line = b''
+    validated = False
+    tmp = f'{fname}.part'
+    try:
+        with open(tmp, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if not validated:
+                    first_line += chunk
+                    if b'\n' in first_line:
+                        validate_header(export_name, first_line.split(b'\n', 1)[0])
+                        validated = True
+                digest.update(chunk)
+                f.write(chunk)
+        if not validated:
+            validate_header(export_name, first_line)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return tmp, digest.hexdigest()
+
 # here is the function tha does the actual requests and saves the corresponding
-# files note the sleep at the end to ensure unique timestamps and hashes
-def export_data(export_name, export_params):
- 
-    print(f"Exporting {export_name}...")
- 
-    timestamp, passhash = generate_nonce_and_passhash()
- 
-    data = {**common_param, **export_params,
-            "nonce": timestamp, "passhash": passhash}
- 
-    response = requests.post(url, data=data)
- 
-    with open(os.path.join(output_dir, files[export_name]), 'wb') as f:
-        f.write(response.content)
-    time.sleep(1)
-
-# unless output_dir points to something else than ./CSV this should actually
-# not be necessary
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
-
-# and finally the loop over all configured exports
-for export_name, export_params in exports.items():
-    export_data(export_name, export_params)
+# files. The session is shared by all exports to reuse its connection pool.
+# Responses are streamed to a temporary file and only renamed over the old CSV
+# once they are complete and valid, so a failed run keeps the previous data.
+# The file is only replaced if its content hash differs from `known_hash`,
+# so unchanged exports keep their modification time. Returns the new hash.
+def export_data(url, password, export_name, export_params, session=requests, known_hash=None):
+    with profiler.stage('export_data', export_name, threaded=True):
+        fname = os.path.join(output_dir, files[export_name])
+        for attempt in range(1, retries + 1):
+            print(f"Exporting {export_name}...")
+
+            # every attempt needs a fresh nonce
+            timestamp, passhash = generate_nonce_and_passhash(password)
+
+            data = {**common_param, **export_params,
+                    "nonce": timestamp, "passhash": passhash}
+
+            try:
+                with session.post(url, data=data, timeout=timeout, stream=True) as response:
+                    response.raise_for_status()
+                    tmp, digest = download(export_name, response, fname)
+                break
+            except (requests.RequestException, ExportError) as e:
+                if attempt == retries:
+                    raise ExportError(f'{export_name}: giving up after {retries} attempts: {e}') from e
+                delay = backoff * 2 ** (attempt - 1)
+                print(f"Export of {export_name} failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+        if digest != known_hash or not os.path.exists(fname):
+            os.replace(tmp, fname)
+        else:
+            os.remove(tmp)
+        return digest
+
+# fetch all configured exports, with up to `jobs` requests in flight at once,
+# update the manifest and return the names of the exports that changed. If
+# some exports fail, the ExportError carries the changed ones in `changed`,
+# since the manifest no longer tells them apart on the next fetch.
+def fetch_all(url, password, jobs=len(exports)):
+    jobs = max(1, jobs)
+    # unless output_dir points to something else than ./CSV this should actually
+    # not be necessary
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest()
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=jobs)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if jobs == 1:
+            results = {}
+            for export_name, export_params in exports.items():
+                try:
+                    results[export_name] = export_data(url, password, export_name, export_params,
+                                                       session, manifest.get(export_name))
+                except Exception as e:
+                    results[export_name] = e
+        else:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                futures = {export_name: pool.submit(export_data, url, password, export_name,
+                                                    export_params, session, manifest.get(export_name))
+                           for export_name, export_params in exports.items()}
+            results = {export_name: future.exception() or future.result()
+                       for export_name, future in futures.items()}
+
+    # exports that failed keep their previous file and manifest entry
+    failed = {export_name: e for export_name, e in results.items()
+              if isinstance(e, Exception)}
+    digests = {export_name: digest for export_name, digest in results.items()
+               if export_name not in failed}
+    changed = [export_name for export_name, digest in digests.items()
+               if manifest.get(export_name) != digest]
+    manifest = {**manifest, **digests}
+    save_manifest(manifest)
+    save_snapshot(manifest)
+    if changed:
+        print(f"Changed exports: {', '.join(changed)}")
+    elif not failed:
+        print("No export changed since the last fetch.")
+    if failed:
+        raise ExportError('\n'.join(str(e) for e in failed.values()), changed)
+    return changed
+
+# read the configuration and fetch all exports, the entry point for RunMe.py
+def fetch(jobs=len(exports)):
+    url, password = read_config()
+    try:
+        return fetch_all(url, password, jobs)
+    except ExportError as e:
+        raise SystemExit(f'Fetching from ConfTool failed, the previous CSV files are kept:\n{e}')
+
+def main():
+    global timeout, retries
+    parser = argparse.ArgumentParser(description='Fetch the CSV exports from ConfTool.')
+    parser.add_argument('-j', '--jobs', type=int, default=len(exports),
+                        help='number of exports requested in parallel (1 fetches them one after another)')
+    parser.add_argument('--connect-timeout', type=float, default=timeout[0],
+                        help='seconds to wait for the connection to ConfTool')
+    parser.add_argument('--read-timeout', type=float, default=timeout[1],
+                        help='seconds to wait for the next chunk of an export')
+    parser.add_argument('--retries', type=int, default=retries,
+                        help='attempts per export, retries back off exponentially')
+    args = parser.parse_args()
+
+    timeout = (args.connect_timeout, args.read_timeout)
+    retries = max(1, args.retries)
+
+    fetch(args.jobs)
+
+if __name__ == "__main__":
+    main()
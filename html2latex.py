@@ -4,16 +4,122 @@
 # License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
 
 import re
+from collections import Counter
+
+# LaTeX replacements for the opening and closing version of every HTML tag we
+# know how to translate. Attributes of the tags are ignored. Extend as required.
+html_tags = {
+    'br':         ('\\newline ', ''),
+    'p':          ('', '\\par'),
+    'li':         ('\\item ', ''),
+    'ol':         ('\\begin{enumerate}', '\\end{enumerate}'),
+    'ul':         ('\\begin{itemize}', '\\end{itemize}'),
+    'sub':        ('\\textsubscript{', '}'),
+    'sup':        ('\\textsuperscript{', '}'),
+    'blockquote': ('\\begin{quote}', '\\end{quote}'),
+    'em':         ('{\\em ', '}'),
+    'strong':     ('{\\bfseries ', '}'),
+}
+
+# tags that never get a closing tag
+void_tags = {'br'}
+
+# the start of a tag's content, i.e. everything between "<" and ">"
+tag_head = re.compile(r'(/?)([a-zA-Z][a-zA-Z0-9]*)\b')
+
+# Converts HTML to LaTeX in a single pass over the input. The text is split at
+# "<", so the scan for tags runs at C speed and only the tags themselves are
+# looked at in Python (the parsed form of each distinct tag string is cached).
+# Open tags are kept on a stack, so that a closing tag also closes all tags
+# left open inside it and tags still open at the end are closed, while stray
+# closing tags are dropped. Tags missing from the table are kept as they are,
+# counted in `unhandled` and passed to `report` the first time they are seen.
+class HTML2LaTeX:
+    def __init__(self, tags=html_tags, void=void_tags, report=None):
+        self.tags = tags
+        self.void = void
+        self.report = report
+        self.unhandled = Counter()
+        self.parsed = {}
+
+    def warn(self, message):
+        if self.report is not None:
+            self.report(message)
+
+    # returns (closing, name) for the content of a tag, False if it is no tag
+    def parse(self, head):
+        match = tag_head.match(head)
+        if match is None:
+            tag = False
+        else:
+            tag = (bool(match.group(1)), match.group(2).lower())
+        self.parsed[head] = tag
+        return tag
+
+    def convert(self, instr):
+        # note that the utf8_clean function re-replaces this with \%
+        instr = instr.replace('%', '\\percent')
+        if '<' not in instr:
+            return instr
+        tags = self.tags
+        parsed = self.parsed
+        parts = instr.split('<')
+        out = [parts[0]]
+        append = out.append
+        stack = []
+        for part in parts[1:]:
+            end = part.find('>')
+            if end < 0:
+                append('<')
+                append(part)
+                continue
+            head = part[:end]
+            tag = parsed.get(head)
+            if tag is None:
+                tag = self.parse(head)
+            if not tag:
+                append('<')
+                append(part)
+                continue
+            closing, name = tag
+            if name not in tags:
+                token = '<' + head + '>'
+                if not self.unhandled[token]:
+                    self.warn(f'unhandled HTML tag {token}')
+                self.unhandled[token] += 1
+                append(token)
+            elif not closing:
+                append(tags[name][0])
+                if name in self.void:
+                    pass
+                elif head.endswith('/'):
+                    append(tags[name][1])
+                else:
+                    stack.append(name)
+            elif stack and stack[-1] == name:
+                append(tags[stack.pop()][1])
+            elif name in stack:
+                while stack:
+                    opened = stack.pop()
+                    append(tags[opened][1])
+                    if opened == name:
+                        break
+                    if tags[opened][1]:
+                        self.warn(f'<{opened}> closed implicitly by </{name}>')
+            elif name not in self.void:
+                self.warn(f'dropped </{name}> without matching <{name}>')
+            append(part[end + 1:])
+        while stack:
+            opened = stack.pop()
+            append(tags[opened][1])
+            if tags[opened][1]:
+                self.warn(f'<{opened}> closed at the end of the text')
+        return ''.join(out)
+
+def print_report(message):
+    print(f'html2latex: {message}')
+
+converter = HTML2LaTeX(report=print_report)
+
 def html2latex(instr):
-    instr = instr.replace('<br />', '\\newline ')
-    instr = re.sub('<p[^><]*>', '', instr).replace('</p>', '\\par')
-    instr = instr.replace('<li>', '\\item ').replace('</li>', '')
-    instr = instr.replace('<ol>', '\\begin{enumerate}').replace('</ol>', '\\end{enumerate}')
-    instr = instr.replace('<ul>', '\\begin{itemize}').replace('</ul>', '\\end{itemize}')
-    instr = instr.replace('<sub>', '\\textsubscript{').replace('</sub>', '}')
-    instr = instr.replace('<sup>', '\\textsuperscript{').replace('</sup>', '}')
-    instr = instr.replace('<blockquote>', '\\begin{quote}').replace('</blockquote>', '\\end{quote}')
-    instr = instr.replace('<em>', '{\\em ').replace('</em>', '}')
-    instr = instr.replace('<strong>', '{\\bfseries ').replace('</strong>', '}')
-    instr = instr.replace('%', '\percent')# note that the utf8_clean function re-replaces this with \%
-    return  instr
+    return converter.convert(instr)
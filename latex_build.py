@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Build scheduler compiling independent LaTeX documents concurrently. Every
+# document runs latexmk as its own process in its own working directory, the
+# output of each run is collected in <document>.latexmk.log next to it, and
+# the first failing document stops the build.
+#
+# Optionally (RunMe.py --formats, experimental) documents sharing a preamble
+# are compiled against a precompiled format dumped by mylatexformat: the
+# preamble is read once when the format is built and loaded from
+# <format>.fmt by every later pdflatex run.
+
+import os
+import re
+import json
+import time
+import hashlib
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import profiling
+from profiling import profiler
+
+class Format:
+    def __init__(self, name, workdir, source=None):
+        self.name = name
+        self.workdir = workdir
+        self.source = source  # file the preamble is dumped from, any document by default
+
+    @property
+    def fmt(self):
+        return os.path.join(self.workdir, self.name + '.fmt')
+
+    @property
+    def log(self):
+        return os.path.join(self.workdir, self.name + '.log')
+
+    @property
+    def stamp_file(self):
+        return os.path.join(self.workdir, self.name + '.fmt.json')
+
+    def command(self, texfile):
+        return ['pdflatex', '-ini', '-recorder', '-interaction=nonstopmode', '-halt-on-error',
+                f'-jobname={self.name}', '&pdflatex', 'mylatexformat.ltx', texfile]
+
+    ############################################################################
+    # The format is keyed on the dumped part of the preamble, on the contents #
+    # of all local files pdflatex read while dumping it (the .cls and .sty    #
+    # files, as recorded in <format>.fls) and on the pdflatex binary, so any  #
+    # change to them rebuilds the format before the next compilation.         #
+    ############################################################################
+    def preamble_hash(self, texfile):
+        with open(os.path.join(self.workdir, texfile), 'r', encoding='utf-8') as f:
+            preamble = f.read().split('\\begin{document}')[0]
+        return hashlib.sha256(preamble.encode('utf-8')).hexdigest()
+
+    def recorded_inputs(self, texfile):
+        inputs = set()
+        try:
+            with open(os.path.join(self.workdir, self.name + '.fls'), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith('INPUT '):
+                        fname = line[len('INPUT '):].strip()
+                        if (not os.path.isabs(fname)
+                                and os.path.normpath(fname) != texfile):
+                            inputs.add(os.path.normpath(fname))
+        except FileNotFoundError:
+            pass
+        return sorted(inputs)
+
+    def input_hashes(self, inputs):
+        hashes = {}
+        for fname in inputs:
+            try:
+                with open(os.path.join(self.workdir, fname), 'rb') as f:
+                    hashes[fname] = hashlib.sha256(f.read()).hexdigest()
+            except FileNotFoundError:
+                hashes[fname] = None
+        return hashes
+
+    def engine(self):
+        pdflatex = shutil.which('pdflatex')
+        return f'{pdflatex}:{os.path.getmtime(pdflatex)}' if pdflatex else None
+
+    def up_to_date(self, texfile):
+        try:
+            with open(self.stamp_file, 'r', encoding='utf-8') as f:
+                stamp = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        return (os.path.exists(self.fmt)
+                and stamp.get('preamble') == self.preamble_hash(texfile)
+                and stamp.get('engine') == self.engine()
+                and stamp.get('inputs') == self.input_hashes(stamp.get('inputs', {})))
+
+    # dump the format from the preamble of `texfile` unless it is up to date,
+    # returns whether a usable format exists afterwards
+    def build(self, texfile):
+        if self.up_to_date(texfile):
+            return True
+        print(f'Building format {self.name}')
+        start = time.perf_counter()
+        try:
+            with profiler.stage('format', self.name):
+                returncode = subprocess.call(self.command(texfile), cwd=self.workdir,
+                                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                             stderr=subprocess.STDOUT)
+        except OSError:
+            returncode = None
+        if returncode != 0 or not os.path.exists(self.fmt):
+            print(f'Building format {self.name} failed (see {self.log}), '
+                  f'compiling without it')
+            return False
+        stamp = {
+            'preamble': self.preamble_hash(texfile),
+            'engine':   self.engine(),
+            'inputs':   self.input_hashes(self.recorded_inputs(texfile)),
+        }
+        with open(f'{self.stamp_file}.part', 'w', encoding='utf-8') as f:
+            json.dump(stamp, f, indent=2, sort_keys=True)
+        os.replace(f'{self.stamp_file}.part', self.stamp_file)
+        print(f'Built format {self.name} in {time.perf_counter() - start:.2f}s')
+        return True
+
+class Document:
+    def __init__(self, name, workdir, texfile, fmt=None, outdir=None, jobname=None):
+        self.name = name
+        self.workdir = workdir
+        self.texfile = texfile
+        self.fmt = fmt
+        self.outdir = outdir      # relative to workdir, workdir itself by default
+        self.jobname = jobname
+
+    @property
+    def stem(self):
+        return os.path.splitext(self.texfile)[0]
+
+    @property
+    def pdf(self):
+        return os.path.join(self.workdir, self.outdir or '', (self.jobname or self.stem) + '.pdf')
+
+    @property
+    def log(self):
+        return os.path.join(self.workdir, self.stem + '.latexmk.log')
+
+    def command(self):
+        command = ['latexmk', '-pdf', '-interaction=nonstopmode', '-halt-on-error']
+        if self.fmt is not None:
+            command.append(f'-pdflatex=pdflatex -fmt={self.fmt.name} %O %S')
+        if self.outdir is not None:
+            command.append(f'-outdir={self.outdir}')
+        if self.jobname is not None:
+            command.append(f'-jobname={self.jobname}')
+        return command + [self.texfile]
+
+# `returncode` is None if `program` could not be run at all
+class BuildError(Exception):
+    def __init__(self, document, returncode, program='latexmk'):
+        self.document = document
+        self.returncode = returncode
+        reason = (f'could not run {program}' if returncode is None
+                  else f'{program} exit code {returncode}')
+        super().__init__(f'{document.name} failed ({reason}), see {document.log}')
+
+    def log_tail(self, lines=20):
+        try:
+            with open(self.document.log, 'r', encoding='utf-8', errors='replace') as f:
+                return ''.join(f.readlines()[-lines:])
+        except FileNotFoundError:
+            return ''
+
+# number of pdflatex passes latexmk reports in its output
+def count_passes(log):
+    try:
+        with open(log, 'r', encoding='utf-8', errors='replace') as f:
+            return len(re.findall(r"Run number \d+ of rule '(?:pdf)?latex", f.read()))
+    except FileNotFoundError:
+        return None
+
+class Scheduler:
+    def __init__(self, jobs=os.cpu_count()):
+        self.jobs = max(1, jobs or 1)
+        self.lock = threading.Lock()
+        self.running = set()
+        self.failed = threading.Event()
+        self.times = {}
+
+    # compile one document, returns it on success and None if the build was
+    # stopped before or while it ran
+    def compile(self, document):
+        if self.failed.is_set():
+            return None
+        print(f'Compiling {document.name}')
+        started, start = time.time(), time.perf_counter()
+        with open(document.log, 'w', encoding='utf-8') as log:
+            process = subprocess.Popen(document.command(), cwd=document.workdir,
+                                       stdin=subprocess.DEVNULL, stdout=log,
+                                       stderr=subprocess.STDOUT)
+            with self.lock:
+                self.running.add(process)
+            if profiler.enabled:
+                returncode, usage = profiling.wait(process)
+            else:
+                returncode, usage = process.wait(), None
+            with self.lock:
+                self.running.discard(process)
+        if profiler.enabled:
+            profiler.add('latexmk', document.name, started, time.perf_counter() - start,
+                         None if usage is None else usage.ru_utime + usage.ru_stime,
+                         None if usage is None else profiling.rss_mb(usage),
+                         count_passes(document.log))
+        if returncode == 0:
+            with self.lock:
+                self.times[document.name] = time.perf_counter() - start
+            return document
+        with self.lock:
+            if self.failed.is_set():
+                return None
+            self.failed.set()
+            for other in self.running:
+                other.terminate()
+        raise BuildError(document, returncode)
+
+    # build the formats of the documents, one per format and from the first
+    # document using it; documents whose format failed are compiled without one
+    def build_formats(self, documents, pool):
+        formats = {}
+        for document in documents:
+            if document.fmt is not None and document.fmt.fmt not in formats:
+                formats[document.fmt.fmt] = pool.submit(document.fmt.build,
+                                                        document.fmt.source or document.texfile)
+        for document in documents:
+            if document.fmt is not None and not formats[document.fmt.fmt].result():
+                document.fmt = None
+
+    # per document compile time, with the format each one was compiled against
+    def report(self, documents):
+        compiled = [document for document in documents if document.name in self.times]
+        if not compiled:
+            return
+        print('\nCompile times:')
+        for document in sorted(compiled, key=lambda d: -self.times[d.name]):
+            fmt = document.fmt.name if document.fmt is not None else 'no format'
+            print(f'{self.times[document.name]:8.2f}s  {document.name} ({fmt})')
+
+    # compile all documents and copy their PDFs to `destination` (if given),
+    # `done` is called with every successfully compiled document
+    def run(self, documents, destination=None, done=None):
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            self.build_formats(documents, pool)
+            futures = [pool.submit(self.compile, document) for document in documents]
+            for future in as_completed(futures):
+                document = future.result()
+                if document is not None:
+                    if destination is not None:
+                        shutil.copy(document.pdf, destination)
+                    if done is not None:
+                        done(document)
+        self.report(documents)
+
+################################################################################
+# Chapter builds (experimental, RunMe.py --chapters). The main file of a book  #
+# only \include's its parts (Chapters/<part>.tex, written by the generator     #
+# with --chapters). Every part is compiled on its own into parts/<part>/ by a  #
+# driver file <book>-<part>.tex that sets \includeonly. The aux files of all   #
+# other parts are copied next to it first, with their page counters set to the #
+# page the following part starts on, which gives the part its page numbers and #
+# references without compiling the others. Parts whose start page moved are    #
+# compiled again until the page numbers settle. The table of contents is the   #
+# first part (it also gets the title page), the index the last one,            #
+# typesetting the merged index entries of all other parts. Finally the part    #
+# PDFs are stitched into <book>.pdf with pdfpages.                             #
+################################################################################
+class Part(Document):
+    def __init__(self, book, part):
+        super().__init__(f'{book.name}-{part}', book.workdir, f'{book.stem}-{part}.tex',
+                         fmt=book.fmt, outdir=os.path.join('parts', part))
+        self.book = book
+        self.part = part
+
+    # the aux file of `other` in the output directory of this part
+    def aux(self, other=None):
+        return os.path.join(self.workdir, self.outdir, 'Chapters', (other or self).part + '.aux')
+
+    @property
+    def idx(self):
+        return os.path.join(self.workdir, self.outdir, self.stem + '.idx')
+
+    def driver(self):
+        return (f'\\def\\gammpart{{{self.part}}}\n'
+                '\\PassOptionsToPackage{noautomatic}{imakeidx}\n'
+                f'\\includeonly{{Chapters/{self.part}}}\n'
+                f'\\input{{{self.book.texfile}}}\n')
+
+class IndexPart(Part):
+    @property
+    def merged(self):
+        return os.path.join(self.workdir, self.outdir, 'merged.idx')
+
+    # latexmk's own makeindex run has to read the merged entries as well
+    def command(self):
+        command = super().command()
+        merged = os.path.join(self.outdir, 'merged.idx')
+        return command[:-1] + ['-e', f'$makeindex = q{{makeindex %O -o %D {merged}}}', self.texfile]
+
+class Book:
+    checkpoint = re.compile(r'\\setcounter\{page\}\{(-?\d+)\}')
+
+    def __init__(self, document, parts):
+        self.document = document
+        self.name = document.name
+        self.workdir = document.workdir
+        self.texfile = document.texfile
+        self.stem = document.stem
+        self.fmt = document.fmt
+        self.parts = [Part(self, part) for part in parts[:-1]] + [IndexPart(self, parts[-1])]
+        self.contents = self.parts[0]
+        self.index = self.parts[-1]
+        self.stitch = Document(f'{self.name}-stitched', self.workdir, f'{self.stem}-stitched.tex',
+                               outdir=os.path.join('parts', 'stitch'), jobname=self.stem)
+
+    @property
+    def state_file(self):
+        return os.path.join(self.workdir, 'parts', 'parts.json')
+
+    def load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_state(self, state):
+        with open(f'{self.state_file}.part', 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(f'{self.state_file}.part', self.state_file)
+
+    def read(self, fname):
+        try:
+            with open(fname, 'r', encoding='utf-8', errors='replace') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # the page the part starts on and the page the next part starts on, from
+    # the page counts of the last compilation of every part
+    def pages(self, state):
+        pages, page = {}, 1
+        for part in self.parts:
+            known = state.get(part.part)
+            end = page + (known['end'] - known['start'] if known else 0)
+            pages[part.part] = (page, end)
+            page = end
+        return pages
+
+    def end_page(self, part):
+        match = self.checkpoint.search(self.read(part.aux()) or '')
+        return int(match.group(1)) if match else None
+
+    def toc_hash(self):
+        toc = [line for part in self.parts[1:] for line in (self.read(part.aux()) or '').splitlines()
+               if line.startswith('\\@writefile{toc}')]
+        return hashlib.sha256('\n'.join(toc).encode('utf-8')).hexdigest()
+
+    def index_entries(self):
+        return ''.join(self.read(part.idx) or '' for part in self.parts[1:-1])
+
+    def stale(self, state, changed):
+        pages = self.pages(state)
+        stale = set(changed)
+        for part in self.parts:
+            known = state.get(part.part)
+            if known is None or known['start'] != pages[part.part][0] or not os.path.exists(part.pdf):
+                stale.add(part.part)
+        if state.get(self.contents.part, {}).get('toc') != self.toc_hash():
+            stale.add(self.contents.part)
+        entries = hashlib.sha256(self.index_entries().encode('utf-8')).hexdigest()
+        if state.get(self.index.part, {}).get('idx') != entries:
+            stale.add(self.index.part)
+        return stale
+
+    # write the driver files and copy the aux files of all parts into the
+    # output directories of `parts`, moved to their current page numbers
+    def sync(self, parts, pages):
+        for part in parts:
+            os.makedirs(os.path.dirname(part.aux()), exist_ok=True)
+            with open(os.path.join(self.workdir, part.texfile), 'w', encoding='utf-8') as f:
+                f.write(part.driver())
+            for other in self.parts:
+                if other is part:
+                    continue
+                end = f'\\setcounter{{page}}{{{pages[other.part][1]}}}'
+                aux = self.read(other.aux())
+                if aux is None or not self.checkpoint.search(aux):
+                    aux = f'\\relax \n\\@setckpt{{Chapters/{other.part}}}{{\n{end}}}\n'
+                with open(part.aux(other), 'w', encoding='utf-8') as f:
+                    f.write(self.checkpoint.sub(lambda _: end, aux))
+
+    def merge_index(self):
+        entries = self.index_entries()
+        os.makedirs(os.path.dirname(self.index.merged), exist_ok=True)
+        with open(self.index.merged, 'w', encoding='utf-8') as f:
+            f.write(entries)
+        with open(self.index.log, 'w', encoding='utf-8') as log:
+            try:
+                returncode = subprocess.call(['makeindex', '-o', self.index.stem + '.ind', 'merged.idx'],
+                                             cwd=os.path.dirname(self.index.merged),
+                                             stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+            except OSError as e:
+                log.write(f'makeindex: {e}\n')
+                returncode = None
+        if returncode != 0:
+            raise BuildError(self.index, returncode, 'makeindex')
+        return hashlib.sha256(entries.encode('utf-8')).hexdigest()
+
+    def compile(self, scheduler, parts, state, done):
+        pages = self.pages(state)
+        self.sync(parts, pages)
+        toc = self.toc_hash()
+        if self.index in parts:
+            entries = self.merge_index()
+        scheduler.run(parts, done=done)
+        for part in parts:
+            end = self.end_page(part)
+            state[part.part] = {'start': pages[part.part][0],
+                                'end': pages[part.part][0] if end is None else end}
+        if self.contents in parts:
+            state[self.contents.part]['toc'] = toc
+        if self.index in parts:
+            state[self.index.part]['idx'] = entries
+        self.save_state(state)
+
+    def write_stitch(self):
+        pdfs = ''.join(f'\\includepdf[pages=-]{{parts/{part.part}/{part.stem}.pdf}}\n'
+                       for part in self.parts)
+        with open(os.path.join(self.workdir, self.stitch.texfile), 'w', encoding='utf-8') as f:
+            f.write('\\documentclass[a4paper]{article}\n\\usepackage{pdfpages}\n'
+                    f'\\begin{{document}}\n{pdfs}\\end{{document}}\n')
+
+    # compile the `changed` parts and every part they move, then stitch the
+    # book and copy it to `destination`
+    def build(self, scheduler, changed, destination, done=None):
+        os.makedirs(os.path.join(self.workdir, 'parts'), exist_ok=True)
+        state = self.load_state()
+        stale = self.stale(state, changed)
+        rounds = 0
+        while stale and rounds <= len(self.parts):
+            # the table of contents and the index typeset the entries of the
+            # chapters, they are only compiled once those settled
+            parts = [part for part in self.parts[1:-1] if part.part in stale]
+            if not parts:
+                parts = [part for part in (self.contents, self.index) if part.part in stale]
+            self.compile(scheduler, parts, state, done)
+            rounds += 1
+            stale = self.stale(state, ())
+        if stale:
+            print(f'The page numbers of {self.name} did not settle, compile it once more')
+        if rounds or not os.path.exists(self.stitch.pdf):
+            self.write_stitch()
+            scheduler.run([self.stitch], destination, done)
+        else:
+            shutil.copy(self.stitch.pdf, destination)
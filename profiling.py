@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Optional profiling of a run (RunMe.py/BoA_DSP_generator.py --profile). Every
+# stage, down to the single export download, section file, room plan and
+# latexmk run, is recorded with its start (seconds since the run started),
+# wall time, CPU time and peak resident set size. CPU time of a stage includes
+# its worker threads and the child processes that finished during it. The
+# peak RSS is the high-water mark of the process that ran the stage, so a
+# stage only shows its own peak if it exceeds the earlier ones; for latexmk it
+# is the peak of latexmk and the pdflatex runs it started (on Linux at least
+# the RSS the forking process had), whose number is taken from the latexmk
+# output (passes). The records of a run are appended to
+# a JSON or CSV report, and with --cprofile the Python stages of the main
+# process are also run under cProfile and dumped to <dir>/<stage>.prof (view
+# them with python -m pstats or snakeviz).
+#
+# The profiler is disabled by default and then records nothing.
+
+import os
+import sys
+import csv
+import json
+import time
+import cProfile
+import datetime as dt
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+columns = ['run', 'stage', 'item', 'start', 'wall', 'cpu', 'rss_mb', 'passes']
+
+def rss_mb(rusage):
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rusage.ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+
+def peak_rss():
+    if resource is None:
+        return None
+    return rss_mb(resource.getrusage(resource.RUSAGE_SELF))
+
+def children_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.cprofile_dir = None
+        self.profiling = False  # a cProfile is active in this process
+        self.records = []
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def enable(self, cprofile_dir=None):
+        self.enabled = True
+        self.cprofile_dir = cprofile_dir
+        self.started = time.time()
+        if cprofile_dir is not None:
+            os.makedirs(cprofile_dir, exist_ok=True)
+
+    # `start` is the time.time() the stage started at, which is comparable
+    # across processes
+    def add(self, stage, item='', start=None, wall=None, cpu=None, rss=None, passes=None):
+        record = {'stage': stage, 'item': item,
+                  'start': None if start is None else round(start - self.started, 3),
+                  'wall': None if wall is None else round(wall, 4),
+                  'cpu': None if cpu is None else round(cpu, 4),
+                  'rss_mb': None if rss is None else round(rss, 1),
+                  'passes': passes}
+        with self.lock:
+            self.records.append(record)
+
+    # Record the enclosed block as `stage`. A stage running in a worker thread
+    # (threaded=True) is charged the CPU time of its thread only. With python=True
+    # the block is also run under cProfile, unless another stage already is.
+    @contextmanager
+    def stage(self, stage, item='', threaded=False, python=False):
+        if not self.enabled:
+            yield
+            return
+        prof = None
+        if python and self.cprofile_dir is not None and not self.profiling:
+            prof = cProfile.Profile()
+            self.profiling = True
+            prof.enable()
+        start, wall = time.time(), time.perf_counter()
+        cpu = time.thread_time() if threaded else time.process_time() + children_cpu()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = (time.thread_time() if threaded else time.process_time() + children_cpu()) - cpu
+            if prof is not None:
+                prof.disable()
+                self.profiling = False
+                name = f'{stage}-{item}' if item else stage
+                prof.dump_stats(os.path.join(self.cprofile_dir, f'{name}.prof'))
+            self.add(stage, item, start, wall, cpu, peak_rss())
+
+    # per stage totals of the run
+    def summary(self):
+        totals = {}
+        for record in sorted(self.records, key=lambda r: (r['start'] is None, r['start'])):
+            count, wall, cpu, rss = totals.get(record['stage'], (0, 0.0, 0.0, None))
+            if record['rss_mb'] is not None:
+                rss = max(rss or 0.0, record['rss_mb'])
+            totals[record['stage']] = (count + 1, wall + (record['wall'] or 0.0),
+                                       cpu + (record['cpu'] or 0.0), rss)
+        print(f'\n{"stage":>18}  {"count":>5}  {"wall":>8}  {"cpu":>8}  {"peak RSS":>9}')
+        for stage, (count, wall, cpu, rss) in totals.items():
+            rss = f'{rss:6.0f} MB' if rss is not None else f'{"-":>9}'
+            print(f'{stage:>18}  {count:5}  {wall:7.2f}s  {cpu:7.2f}s  {rss}')
+
+    # Append the records of this run to `fname`, a CSV file (one row per stage
+    # with the run in the first column) or a JSON list with one entry per run.
+    def write(self, fname):
+        run = dt.datetime.fromtimestamp(self.started).isoformat(timespec='seconds')
+        records = sorted(self.records, key=lambda r: (r['start'] is None, r['start']))
+        if fname.endswith('.csv'):
+            new = not os.path.exists(fname) or os.path.getsize(fname) == 0
+            with open(fname, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, columns)
+                if new:
+                    writer.writeheader()
+                writer.writerows({'run': run, **record} for record in records)
+        else:
+            try:
+                with open(fname, 'r', encoding='utf-8') as f:
+                    runs = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                runs = []
+            if not isinstance(runs, list):
+                runs = [runs]
+            runs.append({'run': run, 'command': sys.argv, 'stages': records})
+            with open(fname, 'w', encoding='utf-8') as f:
+                json.dump(runs, f, indent=2)
+        print(f'Profile of {len(records)} stages appended to {fname}')
+
+profiler = Profiler()
+
+# Calls `function` and returns its result together with its measurements, to
+# be added to the profiler by the caller. Used for tasks in worker processes,
+# whose own profiler is not the one of the run.
+class Measured:
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, *args):
+        start, wall, cpu = time.time(), time.perf_counter(), time.process_time()
+        result = self.function(*args)
+        return result, {'start': start, 'wall': time.perf_counter() - wall,
+                        'cpu': time.process_time() - cpu, 'rss': peak_rss()}
+
+# Wait for `process` like process.wait() and also return its resource usage
+# (None where os.wait4 does not exist). The usage covers the children it
+# waited for, i.e. the pdflatex runs of latexmk.
+def wait(process):
+    if not hasattr(os, 'wait4'):
+        return process.wait(), None
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        return process.wait(), None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, rusage
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# This file is part of the GAMM_PDFs_FROM_CONFTOOL project.
+# Copyright GAMM_PDFs_FROM_CONFTOOL developers and contributors. All rights reserved.
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Immutable schedule model shared by all generators. It is built once per run
+# from the sessions, organizers and contributions frames of the generator:
+# datetimes are plain datetime objects and the fields the LaTeX files print
+# (chairs, speaker, dates and times) are rendered up front, so the writers
+# only read attributes.
+
+import datetime
+from dataclasses import dataclass
+
+import pandas as pd
+
+@dataclass(frozen=True, slots=True)
+class Contribution:
+    idx: int              # position in the session export (p<idx>_*)
+    title: str
+    authors: str          # with the presenter marked up as \presenter{...}
+    organizations: str
+    presenter: str
+    speaker: str          # presenter and organizations as printed for plenaries
+    abstract: str         # converted to LaTeX and cleaned
+    start: datetime.datetime
+    end: datetime.datetime
+    start_time: str
+    duration: float       # minutes, 0 for posters
+    slot: int             # first 20 minute column in the daily program
+
+@dataclass(frozen=True, slots=True)
+class Session:
+    number: str           # session_short
+    name: str
+    room: str
+    start: datetime.datetime
+    end: datetime.datetime
+    chairs: str           # all chairs, separated by \newline
+    chair: str            # first chair, as printed for plenaries
+    date: str
+    start_time: str
+    end_time: str
+    contributions: tuple
+
+    # the contribution exported as p<idx>_*, None if there is none
+    def contribution(self, idx):
+        for contribution in self.contributions:
+            if contribution.idx == idx:
+                return contribution
+        return None
+
+@dataclass(frozen=True, slots=True)
+class Organizer:
+    track_type: str
+    name: str
+    firstname: str
+    organisation: str
+
+@dataclass(frozen=True, slots=True)
+class Conference:
+    sessions: tuple       # in the order of sessions.csv
+    organizers: tuple     # sorted by track_type
+
+def text(value):
+    return '' if pd.isna(value) else value
+
+def render_chairs(c1, c2, c3):
+    if not c3:
+        if not c2:
+            if not c1:
+                return ''
+            return c1
+        return f'{c1}\\newline {c2}'
+    return f'{c1}\\newline {c2}\\newline {c3}'
+
+def make_contribution(c):
+    organizations = text(c.organizations)
+    if organizations:
+        speaker = '\\presenter{' + c.presenter + '} {\\em (' + organizations + ')}'
+    else:
+        speaker = '\\presenter{' + c.presenter + '}'
+    return Contribution(idx=c.idx,
+                        title=text(c.title),
+                        authors=c.authors,
+                        organizations=organizations,
+                        presenter=c.presenter,
+                        speaker=speaker,
+                        abstract=c.abstract,
+                        start=c.start.to_pydatetime(),
+                        end=c.end.to_pydatetime(),
+                        start_time=c.start_time,
+                        duration=c.duration,
+                        slot=c.slot)
+
+def make_session(row, contributions):
+    start = row.session_start.to_pydatetime()
+    end = row.session_end.to_pydatetime()
+    chairs = [text(row.chair1), text(row.chair2), text(row.chair3)]
+    return Session(number=row.session_short,
+                   name=text(row.session_title),
+                   room=row.session_room,
+                   start=start,
+                   end=end,
+                   chairs=render_chairs(*chairs),
+                   chair=chairs[0] or '\\color{red} NOT AVAILABLE',
+                   date=start.strftime("%B %d, %Y"),
+                   start_time=start.strftime("%H:%M"),
+                   end_time=end.strftime("%H:%M"),
+                   contributions=tuple(contributions))
+
+def build_conference(df, organizers, contributions):
+    talks = {}
+    for c in contributions.itertuples(index=False):
+        talks.setdefault(c.session, []).append(make_contribution(c))
+    sessions = tuple(make_session(row, talks.get(row.Index, ()))
+                     for row in df.itertuples())
+    organizers = tuple(Organizer(track_type=row.track_type,
+                                 name=text(row.name),
+                                 firstname=text(row.firstname),
+                                 organisation=text(row.organisation))
+                       for row in organizers.itertuples(index=False))
+    return Conference(sessions=sessions, organizers=organizers)